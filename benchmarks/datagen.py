@@ -0,0 +1,71 @@
+import csv
+import json
+import random
+
+WORDS = ["alpha", "beta", "gamma", "delta", "price", "title", "spider", "parser", "中文", "données", "item", "value"]
+
+
+def _text(rnd, n):
+    return " ".join(rnd.choice(WORDS) for _ in range(n))
+
+
+def make_rows(rows, cols, seed=0):
+    # dict rows with ints, floats, short and long text, a few fields that need csv quoting
+    rnd = random.Random(seed)
+    names = ["c{}".format(i) for i in range(cols)]
+    data = []
+    for i in range(rows):
+        row = {}
+        for j, name in enumerate(names):
+            kind = j % 5
+            if kind == 0:
+                row[name] = i
+            elif kind == 1:
+                row[name] = round(rnd.random() * 1000, 3)
+            elif kind == 2:
+                row[name] = _text(rnd, 2)
+            elif kind == 3:
+                row[name] = _text(rnd, 8) + (', "quoted"' if i % 10 == 0 else "")
+            else:
+                row[name] = _text(rnd, 3) + ("\nsecond line" if i % 50 == 0 else "")
+        data.append(row)
+    return data
+
+
+def make_csv(path, rows, cols, seed=0):
+    data = make_rows(rows, cols, seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(data[0].keys()))
+        writer.writeheader()
+        writer.writerows(data)
+    return path
+
+
+def make_jsonl(path, rows, seed=0):
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(rows):
+            obj = {"id": i, "title": _text(rnd, 4), "price": round(rnd.random() * 100, 2),
+                   "tags": [rnd.choice(WORDS) for _ in range(3)], "meta": {"page": i // 20, "ok": i % 3 == 0}}
+            f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+    return path
+
+
+def make_html(items, seed=0):
+    # a listing page: header, nav, `items` product cards, footer, some inline script noise
+    rnd = random.Random(seed)
+    cards = []
+    for i in range(items):
+        cards.append(
+            '<li class="item" data-id="{0}"><a href="/p/{0}?ref={1}">{2}</a>'
+            '<span class="price">${3:.2f}</span><p class="desc">{4} <b>{5}</b> <script>track({0})</script></p></li>'.format(
+                i, seed, _text(rnd, 3), rnd.random() * 500, _text(rnd, 12), rnd.choice(WORDS)))
+    return ('<html><head><title>page {0}</title><meta charset="utf-8"></head><body>'
+            '<div id="nav"><a href="/">home</a><a href="/c/{0}">category</a></div>'
+            '<div id="main"><h1 class="title">Listing {0}</h1><ul class="items">{1}</ul></div>'
+            '<div id="footer">contact: shop{0}@example.com, tel 010-{2:08d}</div></body></html>').format(seed, "".join(cards), seed * 7919 % 10 ** 8)
+
+
+def make_pages(count, items, seed=0):
+    # distinct pages, so the parsed-document cache does not hide the parse cost
+    return [make_html(items, seed + i) for i in range(count)]
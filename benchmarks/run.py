@@ -0,0 +1,404 @@
+"""Throughput benchmarks for spparser.
+
+    python benchmarks/run.py --size small --out results.json
+    python benchmarks/run.py --baseline results.json --fail-on-regression
+
+Every case runs in a fresh process, so peak RSS belongs to that case only. A case is run --repeat times and
+the fastest run is kept.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks import datagen
+
+SIZES = {
+    "small": {"rows": 20000, "pages": 100, "items_small": 20, "items_large": 1000},
+    "medium": {"rows": 200000, "pages": 300, "items_small": 20, "items_large": 2000},
+    "large": {"rows": 1000000, "pages": 1000, "items_small": 20, "items_large": 5000},
+}
+NARROW_COLS = 5
+WIDE_COLS = 50
+BATCH_SIZE = 1000
+
+CASES = {}
+
+
+def case(name):
+    def register(func):
+        CASES[name] = func
+        return func
+    return register
+
+
+def result(rows, nbytes, seconds, latencies=None):
+    return {"rows": rows, "bytes": nbytes, "seconds": seconds, "latencies": latencies or [seconds]}
+
+
+def _reset_peak_rss():
+    # linux keeps ru_maxrss across exec, a spawned worker would report the parent's peak: reset VmHWM instead
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+# ---------- Reader / Writer
+
+def _read_csv(path):
+    from spparser import Reader
+    t = time.perf_counter()
+    rows = Reader.read_csv(path)
+    return result(len(rows), os.path.getsize(path), time.perf_counter() - t)
+
+
+def _write_csv(ctx, cols):
+    from spparser import Writer
+    data = datagen.make_rows(ctx["rows"], cols)
+    path = os.path.join(ctx["workdir"], "out_{}.csv".format(os.getpid()))
+    t = time.perf_counter()
+    Writer.write_csv(data, path)
+    seconds = time.perf_counter() - t
+    res = result(len(data), os.path.getsize(path), seconds)
+    os.remove(path)
+    return res
+
+
+@case("Reader.read_csv[narrow]")
+def read_csv_narrow(ctx):
+    return _read_csv(ctx["narrow_csv"])
+
+
+@case("Reader.read_csv[wide]")
+def read_csv_wide(ctx):
+    return _read_csv(ctx["wide_csv"])
+
+
+@case("Reader.read_csv_columns[wide]")
+def read_csv_columns_wide(ctx):
+    from spparser import Reader
+    path = ctx["wide_csv"]
+    t = time.perf_counter()
+    cols = Reader.read_csv_columns(path)
+    return result(len(next(iter(cols.values()))), os.path.getsize(path), time.perf_counter() - t)
+
+
+@case("Reader.read_jsonl")
+def read_jsonl(ctx):
+    from spparser import Reader
+    t = time.perf_counter()
+    rows = Reader.read_jsonl(ctx["jsonl"])
+    return result(len(rows), os.path.getsize(ctx["jsonl"]), time.perf_counter() - t)
+
+
+@case("Writer.write_csv[narrow]")
+def write_csv_narrow(ctx):
+    return _write_csv(ctx, NARROW_COLS)
+
+
+@case("Writer.write_csv[wide]")
+def write_csv_wide(ctx):
+    return _write_csv(ctx, WIDE_COLS)
+
+
+# ---------- Extractor, one call per page, every page distinct
+
+def _extract(ctx, items, call):
+    from spparser import Extractor
+    # the first page only warms up imports and the expression caches
+    pages = datagen.make_pages(ctx["pages"] + 1, items)
+    call(Extractor, pages.pop())
+    latencies = []
+    start = time.perf_counter()
+    for page in pages:
+        t = time.perf_counter()
+        call(Extractor, page)
+        latencies.append(time.perf_counter() - t)
+    seconds = time.perf_counter() - start
+    return result(len(pages), sum(len(p.encode("utf-8")) for p in pages), seconds, latencies)
+
+
+def _xpath(Extractor, page):
+    return Extractor.xpath('//li[@class="item"]/a/@href', page, return_all=True)
+
+
+def _css(Extractor, page):
+    return Extractor.css("li.item span.price", page, return_all=True)
+
+
+def _regex(Extractor, page):
+    return Extractor.regex(r"shop\d+@example\.com|\$\d+\.\d{2}", page, return_all=True)
+
+
+for _size in ["small", "large"]:
+    for _name, _call in [("xpath", _xpath), ("css", _css), ("regex", _regex)]:
+        case("Extractor.{}[{}]".format(_name, _size))(
+            lambda ctx, _call=_call, _size=_size: _extract(ctx, ctx["items_" + _size], _call))
+
+
+# ---------- async readers / writers, latency is per batch
+
+def _async_read(reader, path):
+    async def main():
+        latencies, rows = [], 0
+        start = time.perf_counter()
+        t = start
+        async for each in reader:
+            latencies.append(time.perf_counter() - t)
+            rows += len(each)
+            t = time.perf_counter()
+        return result(rows, os.path.getsize(path), time.perf_counter() - start, latencies)
+    res = asyncio.run(main())
+    reader.close()
+    return res
+
+
+def _async_write(make_writer, data, close):
+    async def main():
+        writer = make_writer()
+        latencies = []
+        start = time.perf_counter()
+        for i in range(0, len(data), BATCH_SIZE):
+            t = time.perf_counter()
+            await writer.write(data[i:i + BATCH_SIZE])
+            latencies.append(time.perf_counter() - t)
+        await close(writer)
+        return writer, result(len(data), 0, time.perf_counter() - start, latencies)
+    return asyncio.run(main())
+
+
+@case("async_csv_reader[narrow]")
+def async_csv_reader_narrow(ctx):
+    from spparser.AsyncReader import async_csv_reader
+    return _async_read(async_csv_reader(ctx["narrow_csv"], batch_size=BATCH_SIZE, debug=False), ctx["narrow_csv"])
+
+
+@case("async_csv_reader[wide]")
+def async_csv_reader_wide(ctx):
+    from spparser.AsyncReader import async_csv_reader
+    return _async_read(async_csv_reader(ctx["wide_csv"], batch_size=BATCH_SIZE, debug=False), ctx["wide_csv"])
+
+
+@case("async_jsonl_reader")
+def async_jsonl_reader(ctx):
+    from spparser.AsyncReader import async_jsonl_reader
+    return _async_read(async_jsonl_reader(ctx["jsonl"], batch_size=BATCH_SIZE, debug=False), ctx["jsonl"])
+
+
+@case("async_csv_writer[narrow]")
+def async_csv_writer_narrow(ctx):
+    from spparser.AsyncWriter import async_csv_writer
+    path = os.path.join(ctx["workdir"], "out_{}.csv".format(os.getpid()))
+    data = datagen.make_rows(ctx["rows"], NARROW_COLS)
+    _, res = _async_write(lambda: async_csv_writer(path, debug=False, fsync=False), data, lambda w: w.close())
+    res["bytes"] = os.path.getsize(path)
+    os.remove(path)
+    return res
+
+
+async def _close_db_writer(writer):
+    await writer.close()
+
+
+@case("async_mongo_writer[stand-in]")
+def async_mongo_writer(ctx):
+    from benchmarks import standins
+    standins.install()
+    from spparser.AsyncWriter import async_mongo_writer
+    data = datagen.make_rows(ctx["rows"], NARROW_COLS)
+    make = lambda: async_mongo_writer("bench", host="localhost", port=27017, database="bench", debug=False,
+                                      key_fields=["c0"], ordered=False, sub_batch_size=250, concurrency=4)
+    _, res = _async_write(make, data, _close_db_writer)
+    return res
+
+
+@case("async_mysql_writer[stand-in]")
+def async_mysql_writer(ctx):
+    from benchmarks import standins
+    standins.install()
+    from spparser.AsyncWriter import async_mysql_writer
+    data = datagen.make_rows(ctx["rows"], NARROW_COLS)
+    make = lambda: async_mysql_writer(table="bench", host="localhost", database="bench", debug=False, pool_size=4)
+    writer, res = _async_write(make, data, _close_db_writer)
+    res["bytes"] = writer.pool.bytes
+    return res
+
+
+# ---------- import time, in a fresh interpreter each time
+
+IMPORT_CASES = {
+    "import spparser": "import spparser",
+    "import spparser[Reader]": "from spparser import Reader",
+    "import spparser[Extractor]": "from spparser import Extractor",
+    "import spparser[AsyncWriter]": "from spparser.AsyncWriter import async_mongo_writer, async_mysql_writer",
+}
+IMPORT_RUNS = 10
+
+
+def _import_time(statement):
+    code = "import time; t = time.perf_counter(); {}; print(time.perf_counter() - t)".format(statement)
+    latencies = []
+    for _ in range(IMPORT_RUNS):
+        out = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT)
+        latencies.append(float(out.decode().strip()))
+    # rows are imports here, rows/sec is imports per second of the fastest run
+    return result(1, 0, min(latencies), latencies)
+
+
+for _name, _statement in IMPORT_CASES.items():
+    case(_name)(lambda ctx, _statement=_statement: _import_time(_statement))
+
+
+# ---------- runner
+
+def _run_case(name, ctx):
+    # the package import stays out of the case and out of its peak
+    import spparser
+    _reset_peak_rss()
+    start_rss = _rss_mb()
+    res = CASES[name](ctx)
+    res["start_rss_mb"] = start_rss
+    res["peak_rss_mb"] = _rss_mb()
+    return res
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def summarize(res):
+    latencies = res.pop("latencies")
+    seconds = res["seconds"]
+    res["rows_per_sec"] = res["rows"] / seconds if seconds else 0.0
+    res["mb_per_sec"] = res["bytes"] / 1e6 / seconds if seconds else 0.0
+    res["latency"] = {"count": len(latencies), "mean": sum(latencies) / len(latencies), "p50": _percentile(latencies, 0.5),
+                      "p90": _percentile(latencies, 0.9), "p99": _percentile(latencies, 0.99), "max": max(latencies)}
+    return res
+
+
+def prepare_data(size, data_dir):
+    params = SIZES[size]
+    os.makedirs(data_dir, exist_ok=True)
+    ctx = dict(params, workdir=data_dir)
+    for key, make in [("narrow_csv", lambda p: datagen.make_csv(p, params["rows"], NARROW_COLS)),
+                      ("wide_csv", lambda p: datagen.make_csv(p, params["rows"], WIDE_COLS)),
+                      ("jsonl", lambda p: datagen.make_jsonl(p, params["rows"]))]:
+        path = os.path.join(data_dir, "{}_{}.{}".format(key, size, "jsonl" if key == "jsonl" else "csv"))
+        if not os.path.exists(path):
+            make(path)
+        ctx[key] = path
+    return ctx
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, size, repeat, data_dir):
+    import spparser
+    ctx = prepare_data(size, data_dir)
+    mp_context = multiprocessing.get_context("spawn")
+    results = {}
+    for name in names:
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=mp_context) as pool:
+                runs.append(pool.submit(_run_case, name, ctx).result())
+        best = summarize(min(runs, key=lambda r: r["seconds"]))
+        best["peak_rss_mb"] = max(r["peak_rss_mb"] or 0 for r in runs) or None
+        results[name] = best
+        print("{:<34} {:>12,.0f} rows/s {:>9.2f} MB/s  p50 {:>9.3f} ms  p99 {:>9.3f} ms  rss {:>7.1f} MB".format(
+            name, best["rows_per_sec"], best["mb_per_sec"], best["latency"]["p50"] * 1000, best["latency"]["p99"] * 1000,
+            best["peak_rss_mb"] or 0))
+    meta = {"version": spparser.__version__, "commit": _git_commit(), "size": size, "repeat": repeat,
+            "python": platform.python_version(), "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    return {"meta": meta, "results": results}
+
+
+def compare(current, baseline, threshold):
+    # ratio of rows/sec against the baseline, below 1 - threshold is a regression
+    regressions = []
+    print("\n{:<34} {:>14} {:>14} {:>8}".format("case", "baseline", "current", "ratio"))
+    for name, res in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base or not base["rows_per_sec"]:
+            continue
+        ratio = res["rows_per_sec"] / base["rows_per_sec"]
+        flag = ""
+        if ratio < 1 - threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print("{:<34} {:>14,.0f} {:>14,.0f} {:>8.2f}{}".format(name, base["rows_per_sec"], res["rows_per_sec"], ratio, flag))
+    if current["meta"]["size"] != baseline["meta"]["size"]:
+        print("warning: baseline was run with size={}".format(baseline["meta"]["size"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", choices=list(SIZES), default="small")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="*", help="run the cases whose name contains one of these strings")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "spparser-bench"), help="generated data is kept here between runs")
+    parser.add_argument("--out", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="results json to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed rows/sec drop against the baseline")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args(argv)
+
+    names = [n for n in CASES if not args.only or any(s in n for s in args.only)]
+    if args.list:
+        print("\n".join(names))
+        return 0
+    current = run(names, args.size, args.repeat, args.data_dir)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2, ensure_ascii=False)
+    print("results saved to {}".format(args.out))
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(current, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
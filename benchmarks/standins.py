@@ -0,0 +1,113 @@
+import asyncio
+
+# in-process stand-ins for motor and aiomysql, so the writers' own overhead (hashing, request building,
+# batching, concurrency) is measured without a database server. each call yields to the loop once,
+# like a round trip would
+
+
+class FakeMongoCollection(object):
+    def __init__(self, name):
+        self.name = name
+        self.docs = {}
+        self.calls = 0
+
+    async def bulk_write(self, requests, ordered=True):
+        await asyncio.sleep(0)
+        self.calls += 1
+        for request in requests:
+            self.docs[request._filter["_id"]] = request._doc["$set"]
+
+
+class FakeMongoDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeMongoCollection(name)
+        return self[name]
+
+
+class FakeMotorClient(object):
+    def __init__(self, *args, **kwargs):
+        self.databases = {}
+
+    def __getitem__(self, name):
+        return self.databases.setdefault(name, FakeMongoDatabase())
+
+
+class FakeMysqlCursor(object):
+    def __init__(self, server):
+        self.server = server
+        self.max_stmt_length = None
+        self._result = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        pass
+
+    async def execute(self, sql, args=None):
+        await asyncio.sleep(0)
+        self._result = (self.server.max_allowed_packet,) if "max_allowed_packet" in sql else None
+
+    async def fetchone(self):
+        return self._result
+
+    async def executemany(self, sql, params):
+        await asyncio.sleep(0)
+        # the size of the statements a real cursor would send
+        self.server.rows += len(params)
+        self.server.bytes += sum(len(sql) + sum(len(str(v)) for v in row) for row in params)
+
+
+class FakeMysqlConnection(object):
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self, *args):
+        return FakeMysqlCursor(self.server)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class _Acquire(object):
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        return self.conn
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+class FakeMysqlPool(object):
+    def __init__(self):
+        self.max_allowed_packet = 64 * 1024 * 1024
+        self.rows = 0
+        self.bytes = 0
+
+    def acquire(self):
+        return _Acquire(FakeMysqlConnection(self))
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+async def fake_create_pool(**kwargs):
+    return FakeMysqlPool()
+
+
+def install():
+    import motor.motor_asyncio
+    import aiomysql
+    motor.motor_asyncio.AsyncIOMotorClient = FakeMotorClient
+    aiomysql.create_pool = fake_create_pool
@@ -1,104 +1,297 @@
 from .utils import Exceptions
+from .Reader import Reader
+from .json import JsonUtils
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import os
+import json
+import asyncio
+import time
 import csv
-import re
 import logging
-import motor.motor_asyncio
-import aiomysql
+from .utils.Metrics import make_metrics
+from .utils.Compression import open_file
+from .csv.Record import Schema
+
+logger = logging.getLogger(__name__)
 
 class BaseReader(object):
-    def __init__(self):
-        logging.basicConfig(level=logging.DEBUG,
-                    format='[%(asctime)s] %(filename)s[line:%(lineno)d] %(levelname)s: %(message)s',
-                    datefmt='%Y-%m-%d  %H:%M:%S')
+    def __init__(self, checkpoint=None, checkpoint_name=None):
+        self.metrics = None
+        # position after the last returned batch, saved when the next batch is asked for (the consumer is done with it)
+        self.checkpoint = checkpoint
+        self.checkpoint_name = checkpoint_name
+        self.position = None
+        self._saved_position = None
+
+    def _load_checkpoint(self):
+        if self.checkpoint is None:
+            return None
+        return self.checkpoint.load(self.checkpoint_name)
+
+    def save_checkpoint(self):
+        if self.checkpoint is not None and self.position is not None and self.position != self._saved_position:
+            self.checkpoint.save(self.checkpoint_name, self.position)
+            self._saved_position = self.position
+
+    def clear_checkpoint(self):
+        self.position = None
+        self._saved_position = None
+        if self.checkpoint is not None:
+            self.checkpoint.clear(self.checkpoint_name)
+
+    async def _commit_checkpoint(self):
+        if self.checkpoint is not None and self.position is not None and self.position != self._saved_position:
+            await asyncio.get_running_loop().run_in_executor(None, self.save_checkpoint)
+
+    async def _finish_checkpoint(self):
+        if self.checkpoint is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.clear_checkpoint)
+
+
+class BaseFileReader(BaseReader):
+    # file reads and parsing run on a worker thread, up to `prefetch` batches are read ahead into a bounded queue
+    def __init__(self, file_path, prefetch=2, checkpoint=None, checkpoint_name=None, metrics=None):
+        super().__init__(checkpoint=checkpoint, checkpoint_name=checkpoint_name or os.path.abspath(file_path))
+        self.metrics = make_metrics(metrics, file_path)
+        self.prefetch = prefetch
+        self._bytes_pos = 0
+        self._resume = None
+        self.blocking_time = 0.0
+        self.last_blocking_time = 0.0
+        self._executor = None
+        self._queue = None
+        self._producer = None
+
+    def __aiter__(self):
+        return self
 
+    async def __anext__(self):
+        m = self.metrics
+        t = m.begin() if m is not None else None
+        await self._commit_checkpoint()
+        start = time.perf_counter()
+        wait_start = time.perf_counter()
+        each, position = await self._next_batch()
+        waited = time.perf_counter() - wait_start
+        if each:
+            self.position = position
+            self._ret_each(each)
+            if m is not None:
+                m.end(t, self._count(each))
+        else:
+            if self.debug:
+                logger.info("from source: %s, total get %s lines.", self.file_path, self.total_count)
+            if m is not None:
+                m.reset_idle()
+                m.export()
+            await self._finish_checkpoint()
+            self._resume = None
+            self._reinit_vals()
+        # time this call kept the event loop busy, the wait for the worker thread excluded
+        self.last_blocking_time = time.perf_counter() - start - waited
+        self.blocking_time += self.last_blocking_time
+        if not each:
+            raise StopAsyncIteration
+        return each
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        if not self.prefetch:
+            return await loop.run_in_executor(self._executor, self._read_positioned)
+        if self._producer is None:
+            self._queue = asyncio.Queue(maxsize=self.prefetch)
+            self._producer = loop.create_task(self._produce())
+        item = await self._queue.get()
+        if isinstance(item, Exception):
+            self._producer = None
+            raise item
+        if not item[0]:
+            self._producer = None
+        return item
+
+    def _read_positioned(self):
+        # the position is taken right after the batch on the worker thread, read-ahead batches keep their own
+        each = self._read_batch()
+        if self.metrics is not None:
+            # bytes pulled from the file, read-ahead of the text layer included
+            pos = getattr(self.f, "buffer", self.f).tell()
+            self.metrics.incr("bytes", pos - self._bytes_pos)
+            self._bytes_pos = pos
+        if self.checkpoint is None or not each:
+            return each, None
+        return each, {"offset": self.f.tell(), "count": self.total_count}
+
+    def _load_resume(self):
+        self._resume = self._load_checkpoint()
+        self.total_count = self._resume["count"] if self._resume else 0
+
+    async def _produce(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                item = await loop.run_in_executor(self._executor, self._read_positioned)
+                await self._queue.put(item)
+                if not item[0]:
+                    return
+        except Exception as e:
+            await self._queue.put(e)
+
+    def _seek_start(self):
+        if self._resume is not None:
+            self.f.seek(self._resume["offset"])
+            self._bytes_pos = self._resume["offset"]
+            return
+        self.f.seek(0, 0)
+        self._bytes_pos = 0
+        start_line = self.start_line
+        if self.use_index:
+            start_line = Reader.seek_lines(self.f, self.file_path, start_line)
+        for i in range(1, start_line):
+            if not self.f.readline():
+                break
 
-class async_csv_reader(BaseReader):
-    def __init__(self, file_path, mode='r',batch_size=10, max_read_lines=None, encoding="utf-8", each_line_type="dict", debug=True, **kwargs):
-        super().__init__()
-        if each_line_type not in ["dict", "list"]:
-            raise Exceptions.ArgValueError("each_line_type must be dict or list")
+    def close(self):
+        if self._producer is not None:
+            self._producer.cancel()
+            self._producer = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.f.close()
+
+    def _count(self, each):
+        return len(each)
+
+    def _ret_each(self, each):
+        if self.debug and each:
+            logger.debug("from source: %s, this batch get %s lines", self.file_path, self._count(each))
+        return each
+
+
+class async_csv_reader(BaseFileReader):
+    # each_line_type="record" yields Records sharing one Schema, "columns" yields each batch as {column: numpy array},
+    # see Reader.read_csv_columns
+    def __init__(self, file_path, mode='r',batch_size=10, max_read_lines=None, encoding="utf-8", each_line_type="dict", debug=True, start_line=1, use_index=False, prefetch=2,
+                 checkpoint=None, checkpoint_name=None, metrics=None, dtypes=None, columns=None, sample_size=1000, compression="infer", **kwargs):
+        super().__init__(file_path, prefetch=prefetch, checkpoint=checkpoint, checkpoint_name=checkpoint_name, metrics=metrics)
+        if each_line_type not in ["dict", "list", "record", "columns"]:
+            raise Exceptions.ArgValueError("each_line_type must be dict, list, record or columns")
+        self.dtypes = dtypes
+        self.columns = columns
+        self.sample_size = sample_size
+        self.schema = None
+        self._builder = None
         self.file_path = file_path
         self.max_read_lines = max_read_lines
         self.batch_size = batch_size
         self.mode = mode
         self.encoding = encoding
+        self.each_line_type = each_line_type
+        self.start_line = start_line
+        self.use_index = use_index
         self.debug = debug
         self.finished = False
-        self.each_list = list()
         self.total_count = 0
-        self.f = open(file=self.file_path, mode=self.mode, encoding=self.encoding)
-        if each_line_type == "dict":
-            self.reader = csv.DictReader(self.f)
-        elif each_line_type == "list":
-            self.reader = csv.reader(self.f)
+        self.compression = compression
+        self.f = open_file(self.file_path, mode=self.mode, encoding=self.encoding, compression=compression)
+        self._load_resume()
+        self._init_reader()
 
-    def __aiter__(self):
-        return self
+    def _init_reader(self):
+        fieldnames = None
+        self.f.seek(0, 0)
+        self.skip_to_line = self.start_line
+        if self._resume is not None:
+            if self.each_line_type != "list":
+                fieldnames = next(csv.reader(self.f), None)
+            self.f.seek(self._resume["offset"])
+            self.skip_to_line = 1
+        elif self.use_index:
+            fieldnames, self.skip_to_line = Reader.seek_csv(self.f, self.file_path, self.start_line, "list" if self.each_line_type == "list" else "dict")
+        self._bytes_pos = self.f.buffer.tell()
+        # f.tell() is disabled while a text file is iterated, readline keeps it usable for the checkpoint offset
+        lines = iter(self.f.readline, "") if self.checkpoint is not None else self.f
+        if self.each_line_type == "dict":
+            self.reader = csv.DictReader(lines, fieldnames=fieldnames)
+        elif self.each_line_type == "list":
+            self.reader = csv.reader(lines)
+        else:
+            self.reader = csv.reader(lines)
+            if fieldnames is None:
+                fieldnames = next(self.reader, None)
+            if self.each_line_type == "record":
+                self.schema = Schema(fieldnames or [])
+            else:
+                from .csv.ColumnUtils import ColumnBuilder
+                self._builder = ColumnBuilder(fieldnames, dtypes=self.dtypes, columns=self.columns, sample_size=self.sample_size)
 
-    async def __anext__(self):
+    def _read_batch(self):
+        each_list = []
         if self.finished:
-            if self.debug:
-                logging.info("from source: {}, total get {} lines.".format(self.file_path, self.total_count))
-            self._reinit_vals()
-            raise StopAsyncIteration
-
+            return each_list
         for line in self.reader:
+            if self.reader.line_num < self.skip_to_line:
+                continue
+            # blank lines, which csv.DictReader skips by itself
+            if not line and self.each_line_type != "list":
+                continue
             if self.max_read_lines and self.total_count >= self.max_read_lines:
-                self.finished = True
                 break
-            self.each_list.append(line)
+            each_list.append(line)
             self.total_count += 1
-            if len(self.each_list) >= self.batch_size:
-                return self._ret_each()
-
-        if self.each_list:
-            self.finished = True
-            return self._ret_each()
-        if self.debug:
-            logging.info("from source: {}, total get {} lines.".format(self.file_path, self.total_count))
-        self._reinit_vals()
-        raise StopAsyncIteration
+            if len(each_list) >= self.batch_size:
+                return self._convert(each_list)
+        self.finished = True
+        return self._convert(each_list)
+
+    def _convert(self, each_list):
+        if not each_list:
+            return each_list
+        if self.schema is not None:
+            return list(map(self.schema.make, each_list))
+        if self._builder is not None:
+            return self._builder.convert(each_list)
+        return each_list
+
+    def _count(self, each):
+        if isinstance(each, dict):
+            return len(next(iter(each.values()), ()))
+        return len(each)
 
     def _reinit_vals(self):
         self.finished = False
         self.total_count = 0
-        self.f.seek(0, 0)
+        self._init_reader()
         self.read_lines_count = 0
-        self.each_list.clear()
-
-    def _ret_each(self):
-        if self.debug and self.each_list:
-            logging.info("from source: {}, this batch get {} lines".format(self.file_path, len(self.each_list)))
-        each = self.each_list
-        self.each_list = list()
-        return each
 
 
-class async_anyfile_reader(BaseReader):
-    def __init__(self,file_path, mode='r',batch_size=10, max_read_lines=None, encoding="utf-8", debug=True,trim_each_line=False, **kwargs):
-        super().__init__()
+class async_anyfile_reader(BaseFileReader):
+    def __init__(self,file_path, mode='r',batch_size=10, max_read_lines=None, encoding="utf-8", debug=True,trim_each_line=False, start_line=1, use_index=False, prefetch=2,
+                 checkpoint=None, checkpoint_name=None, metrics=None, compression="infer", **kwargs):
+        super().__init__(file_path, prefetch=prefetch, checkpoint=checkpoint, checkpoint_name=checkpoint_name, metrics=metrics)
         self.file_path = file_path
         self.mode='r'
         self.batch_size = batch_size
         self.max_read_lines = max_read_lines
         self.encoding = encoding
-        self.each_list = []
-        self.f = open(self.file_path, mode=self.mode, encoding=self.encoding)
+        self.compression = compression
+        self.f = open_file(self.file_path, mode=self.mode, encoding=self.encoding, compression=compression)
         self.debug = debug
         self.finished = False
         self.total_count = 0
         self.trim_each_line = trim_each_line
+        self.start_line = start_line
+        self.use_index = use_index
+        self._load_resume()
+        self._seek_start()
 
-    def __aiter__(self):
-        return self
-
-    async def __anext__(self):
+    def _read_batch(self):
+        each_list = []
         if self.finished:
-            if self.debug:
-                logging.info("from source: {}, total get {} lines.".format(self.file_path, self.total_count))
-            self._reinit_vals()
-            raise StopAsyncIteration
-
+            return each_list
         for i in range(0,self.batch_size):
             if self.max_read_lines and self.total_count >= self.max_read_lines:
                 self.finished = True
@@ -106,45 +299,70 @@ class async_anyfile_reader(BaseReader):
 
             line = self.f.readline()
             if line and self.trim_each_line:
-                self.each_list.append(line.strip())
+                each_list.append(line.strip())
             elif line and not self.trim_each_line:
-                self.each_list.append(line)
+                each_list.append(line)
             else:
                 self.finished = True
                 break
-
             self.total_count += 1
-            if len(self.each_list) >= self.batch_size:
-                return self._ret_each()
-
-        if self.each_list:
-            self.finished = True
-            return self._ret_each()
-        if self.debug:
-            logging.info("from source: {}, total get {} lines.".format(self.file_path, self.total_count))
-        self._reinit_vals()
-        raise StopAsyncIteration
+        return each_list
 
     def _reinit_vals(self):
         self.finished = False
         self.total_count = 0
-        self.f.seek(0, 0)
+        self._seek_start()
         self.read_lines_count = 0
-        self.each_list.clear()
 
-    def _ret_each(self):
-        if self.debug and self.each_list:
-            logging.info("from source: {}, this batch get {} lines".format(self.file_path, len(self.each_list)))
-        each = self.each_list
-        self.each_list = list()
-        return each
+
+class async_jsonl_reader(BaseFileReader):
+    def __init__(self, file_path, batch_size=10, max_read_lines=None, encoding="utf-8", debug=True, start_line=1, use_index=False, prefetch=2,
+                 checkpoint=None, checkpoint_name=None, metrics=None, compression="infer", **kwargs):
+        super().__init__(file_path, prefetch=prefetch, checkpoint=checkpoint, checkpoint_name=checkpoint_name, metrics=metrics)
+        self.file_path = file_path
+        self.batch_size = batch_size
+        self.max_read_lines = max_read_lines
+        self.encoding = encoding
+        self.compression = compression
+        self.f = open_file(self.file_path, mode="rb", compression=compression)
+        self.debug = debug
+        self.finished = False
+        self.total_count = 0
+        self.start_line = start_line
+        self.use_index = use_index
+        self._load_resume()
+        self._seek_start()
+
+    def _read_batch(self):
+        each_list = []
+        while not self.finished and len(each_list) < self.batch_size:
+            size = self.batch_size - len(each_list)
+            if self.max_read_lines:
+                size = min(size, self.max_read_lines - self.total_count)
+            raw = list(islice(self.f, size)) if size > 0 else []
+            if not raw:
+                self.finished = True
+                break
+            each = JsonUtils.loads_lines(raw, encoding=self.encoding)
+            each_list.extend(each)
+            self.total_count += len(each)
+        return each_list
+
+    def _reinit_vals(self):
+        self.finished = False
+        self.total_count = 0
+        self._seek_start()
 
 
 class async_mongo_reader(BaseReader):
-    def __init__(self, collection, query=None, host=None, port=None, database=None, username=None, password=None, batch_size=10, max_read_lines=None, debug=True, **kwargs):
-        super().__init__()
+    def __init__(self, collection, query=None, host=None, port=None, database=None, username=None, password=None, batch_size=10, max_read_lines=None, debug=True,
+                 projection=None, count=None, partitions=1, split_key="_id", split_points=None, sample_size=None, checkpoint=None, checkpoint_name=None, metrics=None, **kwargs):
+        super().__init__(checkpoint=checkpoint, checkpoint_name=checkpoint_name or "mongo:{}.{}".format(database, collection))
+        self.metrics = make_metrics(metrics, "mongo:{}.{}".format(database, collection))
         if not host or not port or not database:
             raise Exceptions.ParamsError("lack of mongodb's host or port or database")
+        if count not in [None, "exact", "estimate"]:
+            raise Exceptions.ArgValueError("count must be None, exact or estimate")
         self.collection_name = collection
         self.batch_size = batch_size
         self.query = query or {}
@@ -153,108 +371,252 @@ class async_mongo_reader(BaseReader):
         self.username = username
         self.password = password
         self.database = database
-        self.each_list = []
+        self.projection = projection
+        self.count = count
+        self.partitions = partitions
+        self.split_key = split_key
+        self.split_points = split_points
+        self.sample_size = sample_size or partitions * 32
         self.debug = debug
-        self.finished = False
         self.init_flag = False
+        self.docs_count = None
+        self.done_lines_num = 0
         self.max_read_lines = max_read_lines
+        self._max_read_lines = max_read_lines
+        self._scans = None
         
     async def _init_client(self):
+        import motor.motor_asyncio
         self.client = motor.motor_asyncio.AsyncIOMotorClient('mongodb://{}:{}@{}:{}/{}'.format(self.username, self.password, self.host, self.port, self.database))
         self.db = self.client[self.database]
         self.collection = self.db[self.collection_name]
-        self.cursor = self.collection.find(self.query, batch_size=self.batch_size)
-        if self.query:
+        if self.count == "exact":
             self.docs_count = await self.collection.count_documents(self.query)
-        else:
+        elif self.count == "estimate":
             self.docs_count = await self.collection.estimated_document_count()
-        self.max_read_lines = min(self.max_read_lines, self.docs_count) if self.max_read_lines else self.docs_count
+        if self.docs_count is not None:
+            self.max_read_lines = min(self._max_read_lines, self.docs_count) if self._max_read_lines else self.docs_count
         self.percentage = None
         self.done_lines_num = 0
 
-
     def get_db(self):
         return self.db
 
+    async def get_split_points(self):
+        if self.split_points is not None:
+            return sorted(self.split_points)
+        if self.partitions <= 1:
+            return []
+        # quantiles of a random sample of the split key
+        pipeline = [{"$match": self.query}] if self.query else []
+        pipeline += [{"$sample": {"size": self.sample_size}}, {"$project": {self.split_key: 1}}]
+        keys = sorted([doc[self.split_key] async for doc in self.collection.aggregate(pipeline) if self.split_key in doc])
+        points = []
+        for i in range(1, self.partitions):
+            key = keys[len(keys) * i // self.partitions] if keys else None
+            if key is not None and (not points or key > points[-1]):
+                points.append(key)
+        return points
+
+    def _range_query(self, low, high, last=None):
+        if low is None and high is None and last is None:
+            return self.query
+        cond = {}
+        if last is not None:
+            cond["$gt"] = last
+        elif low is not None:
+            cond["$gte"] = low
+        if high is not None:
+            cond["$lt"] = high
+        if not self.query:
+            return {self.split_key: cond}
+        return {"$and": [self.query, {self.split_key: cond}]}
+
+    async def _start_scans(self):
+        # ranges are [low, high, last returned key, finished], the checkpoint token is this list
+        from bson import json_util
+        token = await asyncio.get_running_loop().run_in_executor(None, self._load_checkpoint)
+        if token:
+            self._ranges = json_util.loads(json.dumps(token["ranges"]))
+            self.done_lines_num = token["count"]
+        else:
+            points = await self.get_split_points()
+            self._ranges = [[low, high, None, False] for low, high in zip([None] + points, points + [None])]
+        pending = [i for i, r in enumerate(self._ranges) if not r[3]]
+        self._queue = asyncio.Queue(maxsize=max(len(pending), 1) * 2)
+        self._running = len(pending)
+        self._projection, self._drop_split_key = self._get_projection()
+        loop = asyncio.get_running_loop()
+        self._scans = [loop.create_task(self._scan(i)) for i in pending]
+
+    def _get_projection(self):
+        # the split key must come back to record the position, returns the projection and whether the key
+        # has to be dropped from the docs again because the user's projection leaves it out
+        projection = self.projection
+        if not projection or (self.checkpoint is None and len(self._ranges) <= 1):
+            return projection, False
+        key = self.split_key
+        if isinstance(projection, dict):
+            if key in projection:
+                if projection[key]:
+                    return projection, False
+                projection = {k: v for k, v in projection.items() if k != key}
+                return projection or None, True
+            # _id and every field of an exclusion projection come back anyway
+            if key == "_id" or not any(projection.values()):
+                return projection, False
+            return dict(projection, **{key: 1}), True
+        if key == "_id" or key in projection:
+            return projection, False
+        return list(projection) + [key], True
+
+    async def _scan(self, i):
+        # one cursor per range, full batches go to the shared queue, None marks the end of the range
+        low, high, last, _ = self._ranges[i]
+        try:
+            cursor = self.collection.find(self._range_query(low, high, last), self._projection, batch_size=self.batch_size)
+            if self.checkpoint is not None:
+                cursor = cursor.sort(self.split_key, 1)
+            each = []
+            async for line in cursor:
+                each.append(line)
+                if len(each) >= self.batch_size:
+                    await self._queue.put((i, each))
+                    each = []
+            if each:
+                await self._queue.put((i, each))
+            await self._queue.put((i, None))
+        except Exception as e:
+            await self._queue.put((i, e))
+
+    async def _stop_scans(self):
+        for task in self._scans or []:
+            task.cancel()
+        if self._scans:
+            await asyncio.gather(*self._scans, return_exceptions=True)
+        self._scans = None
+
     def __aiter__(self):
         return self
 
     async def __anext__(self):
+        m = self.metrics
+        t = m.begin() if m is not None else None
+        await self._commit_checkpoint()
         if not self.init_flag:
             await self._init_client()
             self.init_flag = True
+        if self._scans is None:
+            await self._start_scans()
 
-        if self.finished:
-            if self.debug:
-                logging.info("from source: {}.{}, total get {} lines.".format(self.database, self.collection.name, self.done_lines_num))
-            self._reinit_vals()
-            raise StopAsyncIteration
-
-        async for line in self.cursor:
+        while self._running:
             if self.max_read_lines and self.done_lines_num >= self.max_read_lines:
-                self.finished = True
                 break
-            self.done_lines_num += 1
-            self.each_list.append(line)
-            if len(self.each_list) >= self.batch_size:
-                return self._ret_each()
-
-        if self.each_list:
-            self.finished = True
-            return self._ret_each()
+            i, each = await self._queue.get()
+            if each is None:
+                self._ranges[i][3] = True
+                self._running -= 1
+                continue
+            if isinstance(each, Exception):
+                await self._stop_scans()
+                self._reinit_vals()
+                raise each
+            if self.max_read_lines:
+                each = each[:self.max_read_lines - self.done_lines_num]
+            self.done_lines_num += len(each)
+            if self.checkpoint is not None:
+                from bson import json_util
+                self._ranges[i][2] = each[-1][self.split_key]
+                self.position = {"ranges": json.loads(json_util.dumps(self._ranges)), "count": self.done_lines_num}
+            if self._drop_split_key:
+                for doc in each:
+                    doc.pop(self.split_key, None)
+            if m is not None:
+                m.end(t, len(each))
+            return self._ret_each(each)
 
         if self.debug:
-            logging.info("from source: {}.{}, total get {} lines.".format(self.database, self.collection.name, self.done_lines_num))
+            logger.info("from source: %s.%s, total get %s lines.", self.database, self.collection.name, self.done_lines_num)
+        if m is not None:
+            m.reset_idle()
+            m.export()
+        await self._finish_checkpoint()
+        await self._stop_scans()
         self._reinit_vals()
         raise StopAsyncIteration 
 
     def _reinit_vals(self):
-        self.finished = False
-        self.each_list = []
         self.done_lines_num = 0
-        self.each_list.clear()
-        
 
-    def _ret_each(self):
-        if self.debug and self.each_list:
-            logging.info("from source: {}.{}, this batch get {} lines, percentage: {:.2f}%".format(self.database, self.collection.name, len(self.each_list), self.done_lines_num/self.max_read_lines*100))
-        each = self.each_list
-        self.each_list = list()
+    def _ret_each(self, each):
+        if self.debug and each:
+            if self.max_read_lines:
+                logger.debug("from source: %s.%s, this batch get %s lines, percentage: %.2f%%", self.database, self.collection.name, len(each), self.done_lines_num/self.max_read_lines*100)
+            else:
+                logger.debug("from source: %s.%s, this batch get %s lines, total get %s lines", self.database, self.collection.name, len(each), self.done_lines_num)
         return each
 
 
 class async_mysql_reader(BaseReader):
-    def __init__(self, query_sql=None, host=None, port=None, database=None, username=None, password=None, charset='utf8', batch_size=10, max_read_lines=None,debug=True, **kwargs):
-        super().__init__()
+    def __init__(self, query_sql=None, host=None, port=None, database=None, username=None, password=None, charset='utf8', batch_size=10, max_read_lines=None,debug=True,
+                 stream=True, count=None, keyset_column=None, keyset_start=None, checkpoint=None, checkpoint_name=None, metrics=None, **kwargs):
+        super().__init__(checkpoint=checkpoint, checkpoint_name=checkpoint_name)
         if not host or not database:
             raise Exceptions.ParamsError("lack of mysql's host or database")
         if not query_sql:
             raise Exceptions.ParamsError("lack of query_sql")
+        if checkpoint is not None and not keyset_column:
+            raise Exceptions.ParamsError("checkpoint needs keyset_column, a plain cursor cannot be resumed without replaying the query")
+        if count not in [None, "exact", "estimate"]:
+            raise Exceptions.ArgValueError("count must be None, exact or estimate")
 
         self.batch_size = batch_size
-        self.query_sql = query_sql 
+        self.query_sql = query_sql.strip().rstrip(";")
         self.table_name = self._get_table_name()
+        self.checkpoint_name = checkpoint_name or "mysql:{}.{}".format(database, self.table_name)
+        self.metrics = make_metrics(metrics, "mysql:{}.{}".format(database, self.table_name))
         self.host = host
         self.port = port or 3306
         self.username = username
         self.password = password
         self.database = database
         self.charset = charset
-        self.each_list = []
         self.debug = debug
+        self.stream = stream
+        self.count = count
+        self.keyset_column = keyset_column
+        self.keyset_start = keyset_start
+        self.last_key = keyset_start
         self.finished = False
         self.done_lines_num = 0
         self.percentage = None
+        self.docs_count = None
         self.max_read_lines = max_read_lines
+        self._max_read_lines = max_read_lines
         self._init_flag = False
 
     async def _init_connection(self):
+        import aiomysql
         self.conn = await aiomysql.connect(host=self.host, port=self.port, user=self.username, 
                                            password=self.password, db=self.database, charset=self.charset)
-        self.cursor = await self.conn.cursor(aiomysql.cursors.DictCursor)
-        self.docs_count = await self._get_query_lines_count()
-        self.max_read_lines = min(self.max_read_lines, self.docs_count) if self.max_read_lines else self.docs_count
-        await self.cursor.execute(self.query_sql)
+        token = await asyncio.get_running_loop().run_in_executor(None, self._load_checkpoint)
+        if token:
+            self.last_key = token["last_key"]
+            self.done_lines_num = token["count"]
+        if self.count:
+            async with self.conn.cursor() as cursor:
+                self.docs_count = await self._get_query_lines_count(cursor)
+            self.max_read_lines = min(self._max_read_lines, self.docs_count) if self._max_read_lines else self.docs_count
+        if self.keyset_column:
+            # every batch is its own "... WHERE key > last_key ORDER BY key LIMIT n" query, no cursor stays open
+            self.cursor = await self.conn.cursor(aiomysql.cursors.DictCursor)
+        elif self.stream:
+            # unbuffered server-side cursor: rows are pulled from the server batch by batch
+            self.cursor = await self.conn.cursor(aiomysql.cursors.SSDictCursor)
+            await self.cursor.execute(self.query_sql)
+        else:
+            self.cursor = await self.conn.cursor(aiomysql.cursors.DictCursor)
+            await self.cursor.execute(self.query_sql)
 
     def _get_table_name(self):
         flag = False
@@ -265,54 +627,79 @@ class async_mysql_reader(BaseReader):
             if flag and word:
                 return word
             
-    async def _get_query_lines_count(self):
-        target = re.search(r"SELECT(.*?)FROM", self.query_sql, re.I).group(1).strip()
-        await self.cursor.execute("SELECT COUNT({}) FROM {}".format(target, self.table_name))
-        count = await self.cursor.fetchone()
-        return count["COUNT({})".format(target)]
-        
+    async def _get_query_lines_count(self, cursor):
+        if self.count == "estimate":
+            # the optimizer's row estimate, no scan
+            await cursor.execute("EXPLAIN {}".format(self.query_sql))
+            row = await cursor.fetchone()
+            return int(row[[d[0] for d in cursor.description].index("rows")] or 0)
+        await cursor.execute("SELECT COUNT(*) FROM ({}) AS _count_query".format(self.query_sql))
+        count = await cursor.fetchone()
+        return count[0]
+
+    async def _fetch(self, size):
+        if not self.keyset_column:
+            return await self.cursor.fetchmany(size)
+        if self.last_key is None:
+            sql = "SELECT * FROM ({}) AS _keyset_query".format(self.query_sql)
+            args = None
+        else:
+            # the driver formats the whole statement with args, so literal % in the query must be doubled
+            sql = "SELECT * FROM ({}) AS _keyset_query WHERE {} > %s".format(self.query_sql.replace("%", "%%"), self.keyset_column)
+            args = (self.last_key,)
+        sql += " ORDER BY {} LIMIT {}".format(self.keyset_column, int(size))
+        await self.cursor.execute(sql, args)
+        rows = await self.cursor.fetchall()
+        if rows:
+            self.last_key = rows[-1][self.keyset_column]
+        return list(rows)
+
     def __aiter__(self):
         return self
 
     async def __anext__(self):
+        m = self.metrics
+        t = m.begin() if m is not None else None
+        await self._commit_checkpoint()
         if not self._init_flag:
             await self._init_connection()
             self._init_flag = True
 
-        if self.finished:
-            if self.debug:
-                logging.info("from source: {}.{}, total get {} lines.".format(self.database, self.table_name, self.done_lines_num))
-            await self._reinit_vals_and_close()
-            raise StopAsyncIteration
-        
-        while True:
-            line = await self.cursor.fetchone()
-            if self.max_read_lines and self.done_lines_num >= self.max_read_lines:
-                self.finished = True
-                break
-            self.done_lines_num += 1
-            self.each_list.append(line)
-            if len(self.each_list) >= self.batch_size:
-                return self._ret_each()
-
-        if self.each_list:
+        size = self.batch_size
+        if self.max_read_lines:
+            size = min(size, self.max_read_lines - self.done_lines_num)
+        each = await self._fetch(size) if not self.finished and size > 0 else []
+        if len(each) < size:
             self.finished = True
-            return self._ret_each()
+        if each:
+            self.done_lines_num += len(each)
+            if self.checkpoint is not None:
+                self.position = {"last_key": self.last_key, "count": self.done_lines_num}
+            if m is not None:
+                m.end(t, len(each))
+            return self._ret_each(list(each))
 
         if self.debug:
-            logging.info("from source: {}.{}, total get {} lines.".format(self.database, self.table_name, self.done_lines_num))
+            logger.info("from source: %s.%s, total get %s lines.", self.database, self.table_name, self.done_lines_num)
+        if m is not None:
+            m.reset_idle()
+            m.export()
+        await self._finish_checkpoint()
         await self._reinit_vals_and_close()
         raise StopAsyncIteration
         
     async def _reinit_vals_and_close(self):
         self.finished = False
-        self.each_list.clear()
+        self.done_lines_num = 0
+        self.last_key = self.keyset_start
+        self._init_flag = False
         await self.cursor.close()
         self.conn.close()
 
-    def _ret_each(self):
-        if self.debug and self.each_list:
-            logging.info("from source: {}.{}, this batch get {} lines, percentage: {:.2f}%".format(self.database, self.table_name, len(self.each_list), self.done_lines_num/self.max_read_lines*100))
-        each = self.each_list
-        self.each_list = list()
+    def _ret_each(self, each):
+        if self.debug and each:
+            if self.max_read_lines:
+                logger.debug("from source: %s.%s, this batch get %s lines, percentage: %.2f%%", self.database, self.table_name, len(each), self.done_lines_num/self.max_read_lines*100)
+            else:
+                logger.debug("from source: %s.%s, this batch get %s lines, total get %s lines", self.database, self.table_name, len(each), self.done_lines_num)
         return each
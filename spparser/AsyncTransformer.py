@@ -0,0 +1,184 @@
+import asyncio
+import inspect
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from .utils import Exceptions
+
+logger = logging.getLogger(__name__)
+
+# marks the end of the stream in every queue
+_END = object()
+
+
+class StageStats(object):
+    def __init__(self, name):
+        self.name = name
+        self.batches = 0
+        self.rows = 0
+        self.busy_time = 0.0
+
+    def add(self, each, seconds):
+        self.batches += 1
+        self.rows += len(each) if hasattr(each, "__len__") else 1
+        self.busy_time += seconds
+
+    def as_dict(self, elapsed):
+        return {"batches": self.batches, "rows": self.rows, "busy_time": self.busy_time,
+                "rows_per_sec": self.rows / elapsed if elapsed else 0.0}
+
+
+class AsyncTransformer(object):
+    # reader -> N transform workers -> writers, connected by bounded queues so a slow stage holds back the faster ones
+    def __init__(self, reader, writers, transform=None, workers=4, queue_size=8, executor="coroutine", processes=None,
+                 ordered=False, close_writers=True, debug=True, **kwargs):
+        if executor not in ["coroutine", "thread", "process"]:
+            raise Exceptions.ArgValueError("executor must be coroutine, thread or process")
+        if executor == "coroutine" and transform is not None and not inspect.iscoroutinefunction(transform):
+            executor = "inline"
+        self.reader = reader
+        self.writers = writers if isinstance(writers, (list, tuple)) else [writers]
+        self.transform = transform
+        self.workers = workers
+        self.queue_size = queue_size
+        self.executor_type = executor
+        self.processes = processes
+        self.ordered = ordered
+        self.close_writers = close_writers
+        self.debug = debug
+        self.elapsed = 0.0
+        self._tasks = []
+        self._executor = None
+        self._window = None
+        self.read_stats = StageStats("read")
+        self.transform_stats = StageStats("transform")
+        self.write_stats = [StageStats("write:{}".format(type(w).__name__)) for w in self.writers]
+
+    def stats(self):
+        res = {"read": self.read_stats.as_dict(self.elapsed), "transform": self.transform_stats.as_dict(self.elapsed)}
+        for stat in self.write_stats:
+            res[stat.name] = stat.as_dict(self.elapsed)
+        res["elapsed"] = self.elapsed
+        return res
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        if self.executor_type == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        elif self.executor_type == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.processes or self.workers)
+        in_queue = asyncio.Queue(maxsize=self.queue_size)
+        out_queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.writers]
+        # with ordered=True the reader stays at most this many batches ahead of the last one written, which
+        # bounds the batches held back waiting for a slow one
+        self._window = asyncio.Semaphore(max(self.queue_size, self.workers)) if self.ordered else None
+
+        start = time.perf_counter()
+        self._tasks = [loop.create_task(self._read(in_queue))]
+        self._tasks += [loop.create_task(self._work(in_queue, out_queue)) for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._dispatch(out_queue, write_queues)))
+        self._tasks += [loop.create_task(self._write(w, q, s)) for w, q, s in zip(self.writers, write_queues, self.write_stats)]
+        try:
+            # the first failing stage cancels the whole pipeline
+            done, pending = await asyncio.wait(self._tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            await self.cancel()
+            self.elapsed = time.perf_counter() - start
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            # a failed run still flushes and closes what the writers have got so far
+            if self.close_writers:
+                for writer in self.writers:
+                    await self._close(writer)
+        if self.debug:
+            logger.info("transformer finished in %.2fs: %s", self.elapsed, self.stats())
+        return self.stats()
+
+    async def cancel(self):
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _read(self, in_queue):
+        seq = 0
+        t = time.perf_counter()
+        async for each in self.reader:
+            self.read_stats.add(each, time.perf_counter() - t)
+            if self._window is not None:
+                await self._window.acquire()
+            await in_queue.put((seq, each))
+            seq += 1
+            t = time.perf_counter()
+        for _ in range(self.workers):
+            await in_queue.put(_END)
+
+    async def _work(self, in_queue, out_queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await in_queue.get()
+            if item is _END:
+                await out_queue.put(_END)
+                return
+            seq, each = item
+            t = time.perf_counter()
+            if self.transform is None:
+                res = each
+            elif self.executor_type == "inline":
+                res = self.transform(each)
+            elif self.executor_type == "coroutine":
+                res = await self.transform(each)
+            else:
+                res = await loop.run_in_executor(self._executor, self.transform, each)
+            self.transform_stats.add(each, time.perf_counter() - t)
+            await out_queue.put((seq, res))
+
+    async def _dispatch(self, out_queue, write_queues):
+        # fan out every transformed batch to all writers, restoring the read order when ordered=True
+        ended, next_seq, held = 0, 0, {}
+        while ended < self.workers:
+            item = await out_queue.get()
+            if item is _END:
+                ended += 1
+                continue
+            seq, res = item
+            if not self.ordered:
+                await self._put_all(write_queues, res)
+                continue
+            held[seq] = res
+            while next_seq in held:
+                await self._put_all(write_queues, held.pop(next_seq))
+                self._window.release()
+                next_seq += 1
+        for seq in sorted(held):
+            await self._put_all(write_queues, held[seq])
+        for queue in write_queues:
+            await queue.put(_END)
+
+    async def _put_all(self, write_queues, res):
+        if not res:
+            return
+        for queue in write_queues:
+            await queue.put(res)
+
+    async def _write(self, writer, queue, stat):
+        while True:
+            each = await queue.get()
+            if each is _END:
+                return
+            t = time.perf_counter()
+            await writer.write(each)
+            stat.add(each, time.perf_counter() - t)
+
+    async def _close(self, writer):
+        close = getattr(writer, "close", None)
+        if close is None:
+            return
+        res = close()
+        if inspect.isawaitable(res):
+            await res
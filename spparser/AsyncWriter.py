@@ -1,28 +1,125 @@
+import os
+import time
+import asyncio
 import logging
 import csv
-import pymongo
-import pymysql
-import motor.motor_asyncio
-import aiomysql
 
 from .utils import Exceptions
-from hashlib import md5
-from pymongo import UpdateOne
+from .json import JsonUtils
+from hashlib import md5, blake2b
+from concurrent.futures import ThreadPoolExecutor
+from .utils.Metrics import make_metrics
+from .utils.Compression import open_file, is_compressed
+from .csv.Record import in_order
 
+logger = logging.getLogger(__name__)
 
 
 class BaseWriter(object):
     def __init__(self):
-        logging.basicConfig(level=logging.DEBUG,
-                    format='[%(asctime)s] %(filename)s[line:%(lineno)d] %(levelname)s: %(message)s',
-                    datefmt='%Y-%m-%d  %H:%M:%S')
+        self.metrics = None
 
 
-class async_csv_writer(BaseWriter):
-    def __init__(self, file_path, mode="w", newline=None, each_line_type="dict", headers=None, encoding="utf-8", debug=True, **kwargs):
-        if each_line_type not in ["list","dict"]:
-            raise Exceptions.ArgValueError("each_line_type must be list or dict")
+class BaseFileWriter(BaseWriter):
+    # rows are gathered in memory and written + flushed by a worker thread, one flush in flight at a time:
+    # a writer that fills the next buffer before the previous flush is done waits for it (backpressure)
+    def __init__(self, buffer_lines=10000, flush_interval=1.0, fsync=True):
+        super().__init__()
+        self.buffer_lines = buffer_lines
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.closed = False
+        self._buffer = []
+        self._flushing = None
+        self._last_flush = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_sync()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _buffer_write(self, lines):
+        m = self.metrics
+        t = m.begin() if m is not None else None
+        self._buffer.extend(lines)
+        if len(self._buffer) >= self.buffer_lines or time.monotonic() - self._last_flush >= self.flush_interval:
+            await self.flush()
+        if m is not None:
+            m.end(t, len(lines))
+
+    async def flush(self):
+        if self._flushing is not None:
+            await asyncio.wrap_future(self._flushing)
+            self._flushing = None
+        if self._buffer:
+            each, self._buffer = self._buffer, []
+            self._flushing = self._executor.submit(self._write_batch, each)
+        self._last_flush = time.monotonic()
+
+    async def close(self):
+        if self.closed:
+            return
+        await self.flush()
+        await asyncio.wrap_future(self._executor.submit(self._close_file))
+        self._after_close()
+
+    def close_sync(self):
+        if self.closed:
+            return
+        if self._flushing is not None:
+            self._flushing.result()
+            self._flushing = None
+        if self._buffer:
+            each, self._buffer = self._buffer, []
+            self._write_batch(each)
+        self._close_file()
+        self._after_close()
+
+    def _close_file(self):
+        self.f.flush()
+        # a compressed file syncs itself on close, after its trailer
+        if self.fsync and not is_compressed(self.f):
+            os.fsync(self.f.fileno())
+        self.f.close()
+
+    def _after_close(self):
+        self.closed = True
+        self._executor.shutdown(wait=True)
+        if self.debug:
+            logger.info("to destination: %s, total write %s lines.", self.file_path, self.total_count)
+        if self.metrics is not None:
+            self.metrics.export()
+
+    def _write_batch(self, each):
+        if self.metrics is None:
+            return self._write_lines(each)
+        # runs on the flush thread, _write_lines flushes the text layer so the raw position is exact
+        raw = getattr(self.f, "buffer", self.f)
+        t, start = time.perf_counter(), raw.tell()
+        self._write_lines(each)
+        self.metrics.add_time("io_time", time.perf_counter() - t)
+        self.metrics.incr("bytes", raw.tell() - start)
+
+    def _write_lines(self, each):
+        raise NotImplementedError
+
+
+class async_csv_writer(BaseFileWriter):
+    def __init__(self, file_path, mode="w", newline=None, each_line_type="dict", headers=None, encoding="utf-8", debug=True,
+                 buffer_lines=10000, flush_interval=1.0, fsync=True, metrics=None, compression="infer", **kwargs):
+        super().__init__(buffer_lines=buffer_lines, flush_interval=flush_interval, fsync=fsync)
+        if each_line_type not in ["list", "dict", "record"]:
+            raise Exceptions.ArgValueError("each_line_type must be list, dict or record")
         self.file_path = file_path
+        self.metrics = make_metrics(metrics, file_path)
         self.mode = mode
         self.newline = newline
         self.each_line_type = each_line_type
@@ -30,89 +127,128 @@ class async_csv_writer(BaseWriter):
         self.encoding = encoding
         self.total_count = 0
         self.debug = debug
-        self.f = open(file=file_path, mode=self.mode, encoding=self.encoding, newline=self.newline)
+        self.compression = compression
+        self.f = open_file(file_path, mode=self.mode, encoding=self.encoding, newline=self.newline, compression=compression, fsync=fsync)
         if self.headers:
             self.has_headers = True
             if self.each_line_type == "list":
-                self.writer = csv.writer(self.f, fieldnames=self.headers)
+                self.writer = csv.writer(self.f)
+                self.writer.writerow(self.headers)
             elif self.each_line_type == "dict":
                 self.writer = csv.DictWriter(self.f, fieldnames=self.headers)
                 self.writer.writeheader()
+            elif self.each_line_type == "record":
+                self.writer = csv.writer(self.f)
+                self.writer.writerow(self.headers)
         else:
             self.has_headers = False
 
-    def __enter__(self):
-        return self
-
-    def __exit__(self,exc_type, exc_value, traceback):
-        if self.debug:
-            logging.info("to destination: {}, total write {} lines.".format(self.file_path, self.total_count))
-
     def _get_headers(self,data):
         if self.each_line_type == "list":
             self.writer = csv.writer(self.f)
         elif self.each_line_type == "dict":
             self.writer = csv.DictWriter(self.f, fieldnames=list(data[0].keys()))
             self.writer.writeheader()
+        elif self.each_line_type == "record":
+            self.headers = list(data[0].keys())
+            self.writer = csv.writer(self.f)
+            self.writer.writerow(self.headers)
 
         self.has_headers = True
 
+    def _write_lines(self, each):
+        if self.each_line_type == "record":
+            each = in_order(each, self.headers)
+        self.writer.writerows(each)
+        self.f.flush()
+
     async def write(self, data):
         if not data:
             if self.debug:
-                logging.info("to destination: {}, write {} lines.".format(self.file_path,0))
+                logger.debug("to destination: %s, write %s lines.", self.file_path, 0)
             return 
         if  not isinstance(data,list):
             raise Exceptions.ArgValueError("input data type must be list")
 
         if not self.has_headers:
             self._get_headers(data)
-        
-        for line in data:
-            if not line:
-                continue
-            self.writer.writerow(line)
-            self.total_count += 1
+
+        lines = [line for line in data if line]
+        await self._buffer_write(lines)
+        self.total_count += len(lines)
         if self.debug:
-            logging.info("to destination: {}, write {} lines.".format(self.file_path,len(data)))
+            logger.debug("to destination: %s, write %s lines.", self.file_path, len(data))
 
 
-class async_anyfile_writer(BaseWriter):
-    def __init__(self, file_path, mode="w", newline=None, encoding="utf-8", debug=True, **kwargs):
+class async_anyfile_writer(BaseFileWriter):
+    def __init__(self, file_path, mode="w", newline=None, encoding="utf-8", debug=True, buffer_lines=10000, flush_interval=1.0, fsync=True, metrics=None,
+                 compression="infer", **kwargs):
+        super().__init__(buffer_lines=buffer_lines, flush_interval=flush_interval, fsync=fsync)
         self.file_path = file_path
+        self.metrics = make_metrics(metrics, file_path)
         self.mode = mode
         self.newline = newline
         self.encoding = encoding
         self.total_count = 0
         self.debug = debug
-        self.f = open(file=file_path, mode=self.mode, encoding=self.encoding, newline=self.newline)
+        self.compression = compression
+        self.f = open_file(file_path, mode=self.mode, encoding=self.encoding, newline=self.newline, compression=compression, fsync=fsync)
 
-    def __enter__(self):
-        return self
+    def _write_lines(self, each):
+        self.f.write("".join([str(line)+'\n' for line in each]))
+        self.f.flush()
 
-    def __exit__(self, exc_type, exc_value, traceback):
+    async def write(self, data):
+        if not data:
+            if self.debug:
+                logger.debug("to destination: %s, write %s lines.", self.file_path, 0)
+            return
+        if not isinstance(data, list):
+            raise Exceptions.ArgValueError("input data type must be list")
+        await self._buffer_write(data)
+        self.total_count += len(data)
         if self.debug:
-            logging.info("to destination: {}, total write {} lines.".format(self.file_path, self.total_count))
+            logger.debug("to destination: %s, write %s lines.", self.file_path, len(data))
+
+
+class async_jsonl_writer(BaseFileWriter):
+    def __init__(self, file_path, mode="w", encoding="utf-8", debug=True, buffer_lines=10000, flush_interval=1.0, fsync=True, metrics=None, compression="infer", **kwargs):
+        super().__init__(buffer_lines=buffer_lines, flush_interval=flush_interval, fsync=fsync)
+        self.file_path = file_path
+        self.metrics = make_metrics(metrics, file_path)
+        self.mode = mode.replace("b", "") + "b"
+        self.encoding = encoding
+        self.total_count = 0
+        self.debug = debug
+        self.compression = compression
+        self.f = open_file(file_path, mode=self.mode, compression=compression, fsync=fsync)
+
+    def _write_lines(self, each):
+        self.f.write(JsonUtils.dumps_lines(each, encoding=self.encoding))
+        self.f.flush()
 
     async def write(self, data):
         if not data:
             if self.debug:
-                logging.info("to destination: {}, write {} lines.".format(self.file_path,0))
+                logger.debug("to destination: %s, write %s lines.", self.file_path, 0)
             return
         if not isinstance(data, list):
             raise Exceptions.ArgValueError("input data type must be list")
-        for line in data:
-            self.f.write(str(line)+'\n')
-            self.total_count += 1
+        await self._buffer_write(data)
+        self.total_count += len(data)
         if self.debug:
-            logging.info("to destination: {}, write {} lines.".format(self.file_path,len(data)))
+            logger.debug("to destination: %s, write %s lines.", self.file_path, len(data))
 
 
 class async_mongo_writer(BaseWriter):
-    def __init__(self, collection, host=None, port=None, database=None, username=None, password=None, debug=True, **kwargs):
+    def __init__(self, collection, host=None, port=None, database=None, username=None, password=None, debug=True,
+                 key_fields=None, ordered=True, sub_batch_size=None, concurrency=1, errors="raise", metrics=None, **kwargs):
         super().__init__()
+        self.metrics = make_metrics(metrics, "mongo:{}.{}".format(database, collection))
         if not host or not port or not database:
             raise Exceptions.ParamsError("lack of mongodb's host or port or database")
+        if errors not in ["raise", "collect"]:
+            raise Exceptions.ArgValueError("errors must be raise or collect")
         self.collection_name = collection
         self.host = host
         self.port = port
@@ -120,48 +256,138 @@ class async_mongo_writer(BaseWriter):
         self.password = password
         self.database = database
         self.debug = debug
+        self.key_fields = [key_fields] if isinstance(key_fields, str) else key_fields
+        self.ordered = ordered
+        self.sub_batch_size = sub_batch_size
+        self.concurrency = concurrency
+        self.errors = errors
         self.finished = None
         self.done_lines_num = 0
+        self.failed_batches = []
         self.init_flag = False
+        self._batch_no = 0
+        self._pending = set()
+        self._errors = []
     
     async def _init_client(self):
+        import motor.motor_asyncio
         self.client = motor.motor_asyncio.AsyncIOMotorClient('mongodb://{}:{}@{}:{}/{}'.format(self.username, self.password, self.host, self.port, self.database))
         self.db = self.client[self.database]
         self.collection = self.db[self.collection_name]
+        self._semaphore = asyncio.Semaphore(self.concurrency)
         self.done_lines_num = 0
 
     def __enter__(self):
+        # a sync exit can not wait for the bulk writes still in flight
+        if self.concurrency > 1:
+            raise Exceptions.ParamsError("concurrency > 1 needs async with or await close()")
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         if self.debug:
-            logging.info("to destination: {}.{}, total write {} lines.".format(self.database, self.collection_name, self.done_lines_num))
-    
+            logger.info("to destination: %s.%s, total write %s lines.", self.database, self.collection_name, self.done_lines_num)
+        if self.metrics is not None:
+            self.metrics.export()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def flush(self):
+        if self._pending:
+            await asyncio.wait(self._pending)
+        self._raise_errors()
+
+    async def close(self):
+        await self.flush()
+        if self.debug:
+            logger.info("to destination: %s.%s, total write %s lines.", self.database, self.collection_name, self.done_lines_num)
+        if self.metrics is not None:
+            self.metrics.export()
+
+    def _raise_errors(self):
+        if self._errors:
+            errors, self._errors = self._errors, []
+            raise Exceptions.AsyncWriterError(errors[0])
+
+    def _get_id(self, line):
+        if self.key_fields is None:
+            return md5(str(line).encode()).hexdigest()
+        # only the key fields, in the configured order, so the same record always gets the same _id
+        key = "\x1f".join([repr(line.get(k)) for k in self.key_fields])
+        return blake2b(key.encode(), digest_size=16).hexdigest()
+
+    async def _bulk_write(self, batch_no, requests):
+        t = time.perf_counter()
+        try:
+            await self.collection.bulk_write(requests, ordered=self.ordered)
+            # lines of failed batches are not counted as written
+            self.done_lines_num += len(requests)
+        except Exception as e:
+            if self.errors == "raise":
+                raise
+            # unordered writes keep going past a failed document, the error lists only the failed ones
+            details = getattr(e, "details", None) or {}
+            self.failed_batches.append({"batch": batch_no, "error": e, "write_errors": details.get("writeErrors", [])})
+            logger.error("to destination: %s.%s, batch %s failed: %s", self.database, self.collection_name, batch_no, e)
+        finally:
+            self._semaphore.release()
+            if self.metrics is not None:
+                self.metrics.add_time("io_time", time.perf_counter() - t)
+
     async def write(self, data):
+        m = self.metrics
+        t = m.begin() if m is not None else None
         if not self.init_flag:
             await self._init_client()
             self.init_flag = True
 
         if not data:
             if self.debug:
-                logging.info("to destination: {}.{}, write {} lines.".format(self.database, self.collection.name, len(data)))
+                logger.debug("to destination: %s.%s, write %s lines.", self.database, self.collection.name, len(data))
             return
 
         if not isinstance(data, list):
             raise Exceptions.ArgValueError("input data type must be list")
 
+        self._raise_errors()
         for line in data:
             if "_id" not in line.keys():
-                line["_id"] = md5(str(line).encode()).hexdigest()
+                line["_id"] = self._get_id(line)
+
+        from pymongo import UpdateOne
+        requests = [UpdateOne({"_id":line["_id"]}, {"$set":line}, upsert=True) for line in data]
+        size = self.sub_batch_size or len(requests)
+        for i in range(0, len(requests), size):
+            self._batch_no += 1
+            await self._semaphore.acquire()
+            if self.concurrency <= 1:
+                try:
+                    await self._bulk_write(self._batch_no, requests[i:i+size])
+                except Exception as e:
+                    raise Exceptions.AsyncWriterError(e)
+                continue
+            # up to concurrency bulk writes in flight, errors are raised by the next write/flush/close
+            task = asyncio.get_running_loop().create_task(self._bulk_write(self._batch_no, requests[i:i+size]))
+            self._pending.add(task)
+            task.add_done_callback(self._on_done)
 
-        await self.collection.bulk_write([UpdateOne({"_id":line["_id"]}, {"$set":line}, upsert=True) for line in data])
-        self.done_lines_num += len(data)
+        if m is not None:
+            m.end(t, len(data))
         if self.debug:
-            logging.info("to destination: {}.{}, write {} lines.".format(self.database, self.collection.name, len(data)))
+            logger.debug("to destination: %s.%s, write %s lines.", self.database, self.collection.name, len(data))
+
+    def _on_done(self, task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._errors.append(task.exception())
 
 
 class async_mysql_writer(BaseWriter):
-    def __init__(self, table=None, host=None, port=None, database=None, username=None, password=None, charset='utf8', debug=True, create_table_sql=None, auto_id=False, **kwargs):
+    def __init__(self, table=None, host=None, port=None, database=None, username=None, password=None, charset='utf8', debug=True, create_table_sql=None, auto_id=False,
+                 write_mode="replace", pool_size=1, max_stmt_length=None, metrics=None, **kwargs):
         super().__init__()
         if not host or not database or not host:
             raise Exceptions.ParamsError("lack of mysql's host or database or host")
@@ -169,8 +395,11 @@ class async_mysql_writer(BaseWriter):
             raise Exceptions.ParamsError("parameter table and create_table_sql cannot be set at the same time")
         if not table and not create_table_sql:
             raise Exceptions.ParamsError("'table' or 'create_table_sql' must be set")
+        if write_mode not in ["replace", "insert", "upsert"]:
+            raise Exceptions.ArgValueError("write_mode must be replace, insert or upsert")
         self.create_table_sql = create_table_sql
         self.table_name = table if table else self._get_table_name()
+        self.metrics = make_metrics(metrics, "mysql:{}.{}".format(database, self.table_name))
         self.host = host
         self.port = port or 3306 
         self.username = username
@@ -178,25 +407,43 @@ class async_mysql_writer(BaseWriter):
         self.database = database
         self.charset = charset
         self.auto_id = auto_id
+        self.write_mode = write_mode
+        self.pool_size = pool_size
+        self.max_stmt_length = max_stmt_length
         self.debug = debug
         self.finished = None
         self.total_count = 0
+        self.columns = None
+        self.insert_sql = None
         self.is_already_init_table = False
         self._init_flag = False
+        self._pending = set()
+        self._errors = []
 
     async def _init_connection(self):
-        self.conn = await aiomysql.connect(host=self.host, port=self.port, user=self.username,
-                                           password=self.password, db=self.database, charset=self.charset)
-        self.cursor = await self.conn.cursor()
-
+        import aiomysql
+        self.pool = await aiomysql.create_pool(minsize=1, maxsize=self.pool_size, host=self.host, port=self.port, user=self.username,
+                                               password=self.password, db=self.database, charset=self.charset)
+        self._semaphore = asyncio.Semaphore(self.pool_size)
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT @@max_allowed_packet")
+                max_allowed_packet = (await cursor.fetchone())[0]
+        # leave room for the packet header, a statement never grows past what the server accepts
+        limit = max_allowed_packet - 1024
+        self.max_stmt_length = min(self.max_stmt_length, limit) if self.max_stmt_length else limit
 
     async def _init_table(self, data_0=None):
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await self._create_table(cursor, data_0)
+        self.is_already_init_table = True
+
+    async def _create_table(self, cursor, data_0):
         if self.create_table_sql:
-            await self.cursor.execute(self.create_table_sql)
-            self.is_already_init_table = True
+            await cursor.execute(self.create_table_sql)
             return
         if not data_0:
-            self.is_already_init_table = True
             return
 
         field_config = ["_id VARCHAR(32)"] if self.auto_id and "_id" not in data_0 else []
@@ -213,8 +460,7 @@ class async_mysql_writer(BaseWriter):
             field_config.append("PRIMARY KEY(_id)")
 
         init_sql = "CREATE TABLE IF NOT EXISTS {} ({}) DEFAULT CHARSET={};".format(self.table_name, ",".join(field_config), self.charset)
-        await self.cursor.execute(init_sql)
-        self.is_already_init_tagble = True
+        await cursor.execute(init_sql)
 
     def _get_table_name(self):
         flag = False
@@ -227,51 +473,134 @@ class async_mysql_writer(BaseWriter):
             if flag and word:
                 return word
 
+    def _init_insert_sql(self, data_0):
+        # the column order is fixed by the first row, later rows are written in the same order
+        self.columns = list(data_0.keys())
+        if self.auto_id and "_id" not in self.columns:
+            self.columns.insert(0, "_id")
+        verb = "REPLACE" if self.write_mode == "replace" else "INSERT"
+        sql = "{} INTO {} ({}) VALUES ({})".format(verb, self.table_name, ",".join(self.columns), ",".join(["%s"] * len(self.columns)))
+        if self.write_mode == "upsert":
+            sql += " ON DUPLICATE KEY UPDATE {}".format(",".join(["{0}=VALUES({0})".format(c) for c in self.columns]))
+        self.insert_sql = sql
+
+    @staticmethod
+    def _to_param(v):
+        if type(v) in [list, dict, tuple, set, bool]:
+            return str(v)
+        return v
+
+    def _get_params(self, data):
+        params = []
+        for line in data:
+            if self.auto_id and "_id" not in line.keys():
+                line["_id"] = md5(str(line).encode()).hexdigest() 
+            params.append(tuple([self._to_param(line.get(c)) for c in self.columns]))
+        return params
+
     def __enter__(self):
+        # a sync exit can not wait for the batches still in flight
+        if self.pool_size > 1:
+            raise Exceptions.ParamsError("pool_size > 1 needs async with or await close()")
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        #self.cursor.close()
-        self.conn.close()
+        if self._init_flag:
+            self.pool.terminate()
         if self.debug:
-            logging.info("to destination: {}.{}, total write {} lines.".format(self.database, self.table_name, self.total_count))
+            logger.info("to destination: %s.%s, total write %s lines.", self.database, self.table_name, self.total_count)
+        if self.metrics is not None:
+            self.metrics.export()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def flush(self):
+        if self._pending:
+            await asyncio.wait(self._pending)
+        self._raise_errors()
+
+    async def close(self):
+        try:
+            await self.flush()
+        finally:
+            if self._init_flag:
+                self.pool.close()
+                await self.pool.wait_closed()
+                self._init_flag = False
+            if self.debug:
+                logger.info("to destination: %s.%s, total write %s lines.", self.database, self.table_name, self.total_count)
+            if self.metrics is not None:
+                self.metrics.export()
+
+    def _raise_errors(self):
+        if self._errors:
+            errors, self._errors = self._errors, []
+            raise Exceptions.AsyncWriterError(errors[0])
+
+    async def _execute(self, params):
+        # executemany folds the rows into multi-row VALUES statements of at most max_stmt_length bytes
+        t = time.perf_counter()
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    cursor.max_stmt_length = self.max_stmt_length
+                    try:
+                        await cursor.executemany(self.insert_sql, params)
+                        await conn.commit()
+                    except Exception:
+                        await conn.rollback()
+                        raise
+            # lines of failed batches are not counted as written
+            self.total_count += len(params)
+        finally:
+            self._semaphore.release()
+            if self.metrics is not None:
+                self.metrics.add_time("io_time", time.perf_counter() - t)
     
     async def write(self, data):
+        m = self.metrics
+        t = m.begin() if m is not None else None
         if not self._init_flag:
             await self._init_connection()
             self._init_flag = True
 
         if not data:
             if self.debug:
-                logging.info("to destination: {}.{}, write {} lines.".format(self.database, self.table_name, len(data)))
+                logger.debug("to destination: %s.%s, write %s lines.", self.database, self.table_name, len(data))
             return
 
-        if not self.is_already_init_table:
-            await self._init_table(data_0=data[0])
-
         if not isinstance(data, list):
             raise Exceptions.ArgValueError("input data type must be list")
 
-        try:
-            for line in data:
-                if self.auto_id and "_id" not in line.keys():
-                    line["_id"] = md5(str(line).encode()).hexdigest() 
-                values_config = []
-                for v in line.values():
-                    if type(v) in [str, list, dict, tuple, set, bool]:
-                        values_config.append('"'+str(v)+'"')
-                    if type(v) in [int, float]:
-                        values_config.append(str(v))
-                    if v is None:
-                        values_config.append("null")
-                replace_sql = "REPLACE INTO {}({})  VALUES ({});".format(self.table_name, ",".join(line.keys()), ",".join(values_config))
-                await self.cursor.execute(replace_sql)
-            await self.conn.commit()
+        if not self.is_already_init_table:
+            await self._init_table(data_0=data[0])
+        if self.insert_sql is None:
+            self._init_insert_sql(data[0])
+
+        self._raise_errors()
+        params = self._get_params(data)
+        await self._semaphore.acquire()
+        if self.pool_size <= 1:
+            try:
+                await self._execute(params)
+            except Exception as e:
+                raise Exceptions.AsyncWriterError(e)
+        else:
+            # up to pool_size batches in flight, errors are raised by the next write/flush/close
+            task = asyncio.get_running_loop().create_task(self._execute(params))
+            self._pending.add(task)
+            task.add_done_callback(self._on_done)
 
-        except Exception as e:
-            self.conn.rollback()
-            raise Exceptions.AsyncWriterError(e)
-        
-        self.total_count += len(data)
+        if m is not None:
+            m.end(t, len(data))
         if self.debug:
-            logging.info("to destination: {}.{}, write {} lines.".format(self.database, self.table_name, len(data)))
+            logger.debug("to destination: %s.%s, write %s lines.", self.database, self.table_name, len(data))
+
+    def _on_done(self, task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._errors.append(task.exception())
@@ -0,0 +1,198 @@
+import os
+import math
+import struct
+import logging
+import threading
+from array import array
+from hashlib import blake2b
+from .utils import Exceptions
+
+logger = logging.getLogger(__name__)
+
+# state file header: magic, mode (0 exact, 1 bloom), records added, bits, hashes
+_HEADER = struct.Struct("<8sBQQQ")
+_MAGIC = b"SPDEDUP1"
+
+
+class _HashSet(object):
+    # 64-bit hashes in an open addressing table backed by one array, 0 marks an empty slot. it is kept between
+    # 1/3 and 2/3 full, so a key costs 12 to 24 bytes where a set of ints takes about 80
+    def __init__(self, size=1024):
+        self.table = array("Q", [0]) * size
+        self.mask = size - 1
+        self.size = 0
+
+    def add(self, h):
+        # True when h is new
+        h = h or 1
+        table, mask = self.table, self.mask
+        i = h & mask
+        while True:
+            v = table[i]
+            if v == h:
+                return False
+            if not v:
+                break
+            i = (i + 1) & mask
+        table[i] = h
+        self.size += 1
+        if self.size * 3 > len(table) * 2:
+            self._grow()
+        return True
+
+    def _grow(self):
+        old = self.table
+        self.table = table = array("Q", [0]) * (len(old) * 2)
+        self.mask = mask = len(table) - 1
+        for h in old:
+            if h:
+                i = h & mask
+                while table[i]:
+                    i = (i + 1) & mask
+                table[i] = h
+
+
+class Deduplicator(object):
+    # drops records seen before, keyed on key_fields or the whole record. exact keeps a 64-bit hash per key in
+    # a _HashSet (12 to 24 bytes per key), bloom a fixed bit array sized for capacity/error_rate (capped by max_memory bytes)
+    def __init__(self, key_fields=None, mode="exact", capacity=1000000, error_rate=0.001, max_memory=None, state_path=None):
+        if mode not in ["exact", "bloom"]:
+            raise Exceptions.ArgValueError("mode must be exact or bloom")
+        if not 0 < error_rate < 1:
+            raise Exceptions.ArgValueError("error_rate must be between 0 and 1")
+        self.key_fields = [key_fields] if isinstance(key_fields, (str, int)) else key_fields
+        self.mode = mode
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_memory = max_memory
+        self.state_path = state_path
+        self.count = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._hashes = _HashSet()
+        self._bits = None
+        self.num_bits = 0
+        self.num_hashes = 0
+        if mode == "bloom":
+            self._init_bloom()
+        if state_path and os.path.exists(state_path):
+            self.load(state_path)
+
+    def _init_bloom(self):
+        num_bits = int(math.ceil(-self.capacity * math.log(self.error_rate) / math.log(2) ** 2))
+        if self.max_memory and num_bits > self.max_memory * 8:
+            num_bits = self.max_memory * 8
+            logger.warning("bloom filter capped at %s bytes, expected error rate at capacity %.4f%%",
+                           self.max_memory, self.expected_error_rate(num_bits, self.capacity) * 100)
+        self.num_bits = max(num_bits, 8)
+        self.num_hashes = max(1, int(round(self.num_bits / max(self.capacity, 1) * math.log(2))))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    @staticmethod
+    def expected_error_rate(num_bits, count, num_hashes=None):
+        if not count:
+            return 0.0
+        num_hashes = num_hashes or max(1, int(round(num_bits / count * math.log(2))))
+        return (1 - math.exp(-num_hashes * count / num_bits)) ** num_hashes
+
+    def __len__(self):
+        return self.count
+
+    def _key(self, line):
+        if self.key_fields is not None:
+            if isinstance(line, dict):
+                key = "\x1f".join([repr(line.get(k)) for k in self.key_fields])
+            else:
+                key = "\x1f".join([repr(line[k]) for k in self.key_fields])
+        elif isinstance(line, dict):
+            # field order does not matter for the whole record, keys of mixed types sort by their repr
+            key = repr(sorted(line.items(), key=lambda kv: repr(kv[0])))
+        elif isinstance(line, bytes):
+            return blake2b(line, digest_size=16).digest()
+        else:
+            key = line if isinstance(line, str) else repr(line)
+        return blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+    def _add(self, digest):
+        # True when the key is new
+        if self.mode == "exact":
+            return self._hashes.add(int.from_bytes(digest[:8], "little"))
+        # enhanced double hashing: bit i is h1 + i * h2 + (i^3 - i) / 6
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little")
+        bits, num_bits, new = self._bits, self.num_bits, False
+        for i in range(self.num_hashes):
+            pos = (h1 + i * h2 + (i * i * i - i) // 6) % num_bits
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                new = True
+        return new
+
+    def seen(self, line):
+        with self._lock:
+            if self._add(self._key(line)):
+                self.count += 1
+                return False
+            self.dropped += 1
+            return True
+
+    def filter(self, each):
+        digests = [self._key(line) for line in each]
+        res = []
+        with self._lock:
+            for line, digest in zip(each, digests):
+                if self._add(digest):
+                    res.append(line)
+            self.count += len(res)
+            self.dropped += len(each) - len(res)
+        return res
+
+    async def wrap(self, reader):
+        # async for items in dedup.wrap(reader), batches left empty are skipped
+        async for each in reader:
+            each = self.filter(each)
+            if each:
+                yield each
+
+    def save(self, path=None):
+        path = path or self.state_path
+        if not path:
+            raise Exceptions.ParamsError("lack of state_path")
+        tmp_path = "{}.tmp{}".format(path, os.getpid())
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, int(self.mode == "bloom"), self.count, self.num_bits, self.num_hashes))
+                if self.mode == "exact":
+                    # the table as it is, empty slots included
+                    self._hashes.table.tofile(f)
+                else:
+                    f.write(self._bits)
+            os.replace(tmp_path, path)
+
+    def load(self, path=None):
+        path = path or self.state_path
+        with open(path, "rb") as f:
+            magic, mode, count, num_bits, num_hashes = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC or mode != int(self.mode == "bloom"):
+                raise Exceptions.ParamsError("{} is not a {} dedup state file".format(path, self.mode))
+            with self._lock:
+                self.count = count
+                if self.mode == "exact":
+                    hashes = array("Q")
+                    hashes.frombytes(f.read())
+                    size = 1024
+                    while size * 2 < len(hashes) * 3:
+                        size *= 2
+                    self._hashes = _HashSet(size)
+                    for h in hashes:
+                        if h:
+                            self._hashes.add(h)
+                else:
+                    # the saved filter keeps its own size, capacity/error_rate only apply to new filters
+                    self.num_bits, self.num_hashes = num_bits, num_hashes
+                    self._bits = bytearray(f.read())
+
+    def close(self):
+        if self.state_path:
+            self.save()
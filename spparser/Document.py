@@ -0,0 +1,58 @@
+from lxml import etree
+from lxml.etree import HTMLParser
+from .regex import RegexUtils
+from .xpath import XpathUtils
+from .css import CssUtils, css_root
+from .utils import Exceptions
+
+
+class Document(object):
+    # parse the text once, then run any number of xpath/css/regex extractions against the same tree
+    parser_type_map = {
+                        "html": HTMLParser,
+                            }
+
+    def __init__(self, text, parser_type="html"):
+        if parser_type not in self.parser_type_map.keys():
+            raise Exceptions.XpathParserTypeError
+        self.text = text
+        self.parser_type = parser_type
+        self._tree = None
+        self._parsed = False
+        self._css_tree = None
+        self._css_parsed = False
+
+    @property
+    def tree(self):
+        if not self._parsed:
+            self._tree = etree.HTML(self.text, self.parser_type_map[self.parser_type]())
+            self._parsed = True
+        return self._tree
+
+    @property
+    def css_tree(self):
+        # css runs on the root pyquery built for the text, which differs from the html tree for fragments
+        if not self._css_parsed:
+            self._css_tree = css_root(self.text)
+            self._css_parsed = True
+        return self._css_tree
+
+    def xpath(self, xpath_exp, return_all=False, **kwargs):
+        xutils = XpathUtils(xpath_exp=xpath_exp, text=self.text, parser_type=self.parser_type, tree=self.tree)
+        if not return_all:
+            return xutils.extract_first()
+        return xutils.extract_all()
+
+    def css(self, css_exp, result_type="text", attr_name=None, remove_tags_exp=None, return_all=False, engine="lxml", **kwargs):
+        if self.css_tree is None:
+            return [] if return_all else None
+        cssutils = CssUtils(css_exp=css_exp, text=self.text, tree=self.css_tree, result_type=result_type, attr_name=attr_name, remove_tags_exp=remove_tags_exp, engine=engine)
+        if not return_all:
+            return cssutils.extract_first()
+        return cssutils.extract_all()
+
+    def regex(self, pattern, flags=0, trim_mode=False, return_all=False, **kwargs):
+        rutils = RegexUtils(pattern=pattern, string=self.text, flags=flags, trim_mode=trim_mode)
+        if not return_all:
+            return rutils.extract_first()
+        return rutils.extract_all()
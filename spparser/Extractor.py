@@ -1,12 +1,61 @@
 from .regex import RegexUtils
-from .xpath import XpathUtils
-from .css import CssUtils
+from .xpath import xpath_cache
+from .css import css_cache
+from .Document import Document
+from .utils.LRUCache import LRUCache
 from .utils.retObjects import retObjects
+from .utils import Exceptions
 import re
 
+
+def _bind_extractor(method, exp, kwargs):
+    func = getattr(Extractor, method)
+    return lambda text: func(exp, text, **kwargs)
+
+
 class Extractor(object):
+    _document_cache = None
+
+    @staticmethod
+    def parse(text, parser_type="html"):
+        return Document(text, parser_type=parser_type)
+
+    @staticmethod
+    def set_document_cache(maxsize=128):
+        # keep the last `maxsize` parsed documents, keyed by text, so that repeated calls on the same page reuse one tree
+        Extractor._document_cache = LRUCache(maxsize=maxsize) if maxsize else None
+
+    @staticmethod
+    def set_expression_cache(maxsize=1024):
+        xpath_cache.maxsize = maxsize
+        css_cache.maxsize = maxsize
+        xpath_cache.clear()
+        css_cache.clear()
+
+    @staticmethod
+    def cache_info():
+        info = {"xpath": xpath_cache.info(), "css": css_cache.info()}
+        if Extractor._document_cache is not None:
+            info["document"] = Extractor._document_cache.info()
+        return info
+
+    @staticmethod
+    def _get_document(text):
+        if isinstance(text, Document):
+            return text
+        cache = Extractor._document_cache
+        if cache is None:
+            return Document(text)
+        doc = cache.get(text)
+        if doc is None:
+            doc = Document(text)
+            cache.put(text, doc)
+        return doc
+
     @staticmethod
     def regex(pattern, string, flags=0, trim_mode=False, return_all=False, **kwargs):
+        if isinstance(string, Document):
+            string = string.text
         rutils = RegexUtils(pattern=pattern, string=string, flags=flags, trim_mode=trim_mode)
         if not return_all:
             res = rutils.extract_first()
@@ -20,19 +69,29 @@ class Extractor(object):
 
     @staticmethod
     def xpath(xpath_exp, text, return_all=False, **kwargs):
-        xutils = XpathUtils(xpath_exp=xpath_exp, text=text)
-        if not return_all:
-            res = xutils.extract_first()
-        else:
-            res = xutils.extract_all()
-        return res
+        doc = Extractor._get_document(text)
+        return doc.xpath(xpath_exp, return_all=return_all)
     
     @staticmethod
-    def css(css_exp, text, result_type="text", attr_name=None,remove_tags_exp=None, return_all=False,**kwargs):
-        cssutils = CssUtils(css_exp=css_exp, text=text, result_type=result_type, attr_name=attr_name, remove_tags_exp=remove_tags_exp)
-        if not return_all:
-            res = cssutils.extract_first()
-        else:
-            res = cssutils.extract_all()
-        return res
+    def css(css_exp, text, result_type="text", attr_name=None,remove_tags_exp=None, return_all=False, engine="lxml", **kwargs):
+        doc = Extractor._get_document(text)
+        return doc.css(css_exp, result_type=result_type, attr_name=attr_name, remove_tags_exp=remove_tags_exp, return_all=return_all, engine=engine)
+
+    @staticmethod
+    def _get_pool(method, exp, processes, chunksize, ordered, kwargs):
+        if method not in ["xpath", "css", "regex"]:
+            raise Exceptions.ArgValueError("method must be xpath, css or regex")
+        # the process pool machinery is only imported by the batch methods
+        from .utils.BatchPool import BatchPool
+        return BatchPool(_bind_extractor, args=(method, exp, kwargs), processes=processes, chunksize=chunksize, ordered=ordered)
 
+    @staticmethod
+    def map(method, exp, texts, processes=None, chunksize=32, ordered=True, **kwargs):
+        # run Extractor.<method>(exp, text, **kwargs) for every text on a process pool
+        with Extractor._get_pool(method, exp, processes, chunksize, ordered, kwargs) as pool:
+            return pool.map(texts)
+
+    @staticmethod
+    async def amap(method, exp, texts, processes=None, chunksize=32, ordered=True, **kwargs):
+        async with Extractor._get_pool(method, exp, processes, chunksize, ordered, kwargs) as pool:
+            return await pool.amap(texts)
@@ -1,4 +1,143 @@
+import re
+from copy import deepcopy
+from lxml import etree
+from .Document import Document
+from .xpath import compile_xpath
+from .css import compile_css
+from .css.NodeUtils import inner_html, node_text, remove_node
+from .utils import Exceptions
+
+
+class Field(object):
+    # one compiled schema rule, e.g. {"css": "li.item", "return_all": True, "fields": {...}}
+    def __init__(self, name, rule, nested=False):
+        if isinstance(rule, str):
+            rule = {"xpath": rule}
+        if not isinstance(rule, dict):
+            raise Exceptions.ParamsError("rule of field '{}' must be a dict or an xpath string".format(name))
+        kinds = [kind for kind in ["xpath", "css", "regex"] if kind in rule]
+        if len(kinds) != 1:
+            raise Exceptions.ParamsError("field '{}' must set exactly one of xpath, css or regex".format(name))
+        self.name = name
+        self.kind = kinds[0]
+        self.exp = rule[self.kind]
+        self.nested = nested
+        self.return_all = rule.get("return_all", False)
+        self.result_type = rule.get("result_type", "text")
+        self.attr_name = rule.get("attr_name")
+        self.default = rule.get("default")
+        self.trim_mode = rule.get("trim_mode", False)
+        processors = rule.get("processors") or []
+        self.processors = [processors] if callable(processors) else list(processors)
+        if self.result_type not in ["text", "html", "attr"]:
+            raise Exceptions.ArgValueError('result_type must be "text", "html" or "attr"')
+
+        self.fields = None
+        if "fields" in rule:
+            if self.kind == "regex":
+                raise Exceptions.ParamsError("field '{}': nested fields need an xpath or css rule".format(name))
+            self.fields = [Field(k, v, nested=True) for k, v in rule["fields"].items()]
+
+        self._remove = compile_css(rule["remove_tags_exp"]) if rule.get("remove_tags_exp") else None
+        if self.kind == "xpath":
+            self._select = compile_xpath(self.exp)
+        elif self.kind == "css":
+            self._select = compile_css(self.exp)
+        else:
+            self._regex = re.compile(self.exp, rule.get("flags", 0))
+
+    def extract(self, node, text=None):
+        if self.kind == "regex":
+            if text is None:
+                text = inner_html(node) if node is not None else ""
+            values = self._match(text)
+        elif node is None:
+            values = []
+        elif self.fields is not None:
+            values = [self._extract_fields(n) for n in self._nodes(node) if isinstance(n, etree._Element)]
+        else:
+            values = [self._render(n) for n in self._nodes(node)]
+
+        if not self.return_all:
+            values = values[:1]
+        # nothing matched or no such attribute: processors are skipped and default applies
+        for processor in self.processors:
+            values = [processor(v) if v is not None else None for v in values]
+        if not values:
+            return self.default
+        if not self.return_all:
+            return values[0] if values[0] is not None else self.default
+        return values
+
+    def _nodes(self, node):
+        if self.kind == "xpath":
+            res = self._select(node)
+            return res if isinstance(res, list) else [res]
+        if self.nested or self.return_all:
+            # same scope as Extractor.css(return_all=True): matched inside each child of the node
+            return [n for child in node for n in self._select(child)]
+        return self._select(node)
+
+    def _extract_fields(self, node):
+        return {field.name: field.extract(node) for field in self.fields}
+
+    def _render(self, node):
+        if not isinstance(node, etree._Element):
+            return str(node) if isinstance(node, str) else node
+        if self.result_type == "attr":
+            return node.get(self.attr_name)
+        if self._remove is not None:
+            node = deepcopy(node)
+            for tag in self._remove(node):
+                remove_node(tag)
+        if self.result_type == "html":
+            return inner_html(node)
+        return node_text(node)
+
+    def _match(self, text):
+        # same results as Extractor.regex
+        if not self.return_all:
+            m = self._regex.search(text)
+            if m is None:
+                return []
+            return [m.groups() if self.trim_mode else m.group()]
+        if self.trim_mode:
+            return self._regex.findall(text)
+        return [m.group() for m in self._regex.finditer(text)]
+
+
+def _bind_parser(schema, parser_type):
+    return Parser(schema, parser_type=parser_type).parse
 
 
 class Parser(object):
-    pass 
+    # every top-level field runs from the document root, sibling rules with a common prefix are not merged
+    # (xpath/css prefixes can not be split safely, e.g. positional predicates), only nested fields share their
+    # parent's matched nodes
+    def __init__(self, schema, parser_type="html"):
+        if not isinstance(schema, dict):
+            raise Exceptions.ParamsError("schema must be dict type")
+        self.schema = schema
+        self.parser_type = parser_type
+        self.fields = [Field(name, rule) for name, rule in schema.items()]
+        self.kinds = set(field.kind for field in self.fields)
+
+    def parse(self, text):
+        doc = text if isinstance(text, Document) else Document(text, parser_type=self.parser_type)
+        # same roots as Extractor.xpath and Extractor.css, each built only if a field needs it
+        roots = {"xpath": doc.tree if "xpath" in self.kinds else None, "css": doc.css_tree if "css" in self.kinds else None}
+        return {field.name: field.extract(roots.get(field.kind), doc.text) for field in self.fields}
+
+    def get_pool(self, processes=None, chunksize=32, ordered=True):
+        # each worker compiles the schema once, tasks only carry the documents
+        # the process pool machinery is only imported by the batch methods
+        from .utils.BatchPool import BatchPool
+        return BatchPool(_bind_parser, args=(self.schema, self.parser_type), processes=processes, chunksize=chunksize, ordered=ordered)
+
+    def map_many(self, texts, processes=None, chunksize=32, ordered=True):
+        with self.get_pool(processes=processes, chunksize=chunksize, ordered=ordered) as pool:
+            return pool.map(texts)
+
+    async def amap_many(self, texts, processes=None, chunksize=32, ordered=True):
+        async with self.get_pool(processes=processes, chunksize=chunksize, ordered=ordered) as pool:
+            return await pool.amap(texts)
@@ -1,61 +1,177 @@
+import os
 import csv
 import json
+from itertools import islice
 from .utils import Exceptions
+from .utils.LineIndex import LineIndex
+from .utils.Compression import open_file, is_compressed
+from .json import JsonUtils
+from .csv.Record import Schema
 
 class Reader(object):
     @staticmethod
-    def read_csv(file_path, mode="r", newline=None, each_line_type="dict", start_line=1, max_read_lines=None, encoding="utf-8", **kwargs):
-        if each_line_type not in ["list", "dict"]:
-            raise  Exceptions.ArgValueError("each_line_type must be list or dict")
-        res = []
+    def read_csv(file_path, mode="r", newline=None, each_line_type="dict", start_line=1, max_read_lines=None, encoding="utf-8", use_index=False, compression="infer", **kwargs):
+        return list(Reader.iter_csv(file_path, mode=mode, newline=newline, each_line_type=each_line_type, start_line=start_line,
+                                    max_read_lines=max_read_lines, encoding=encoding, use_index=use_index, compression=compression))
+
+    @staticmethod
+    def iter_csv(file_path, mode="r", newline=None, each_line_type="dict", start_line=1, max_read_lines=None, encoding="utf-8", batch_size=None, use_index=False, compression="infer", **kwargs):
+        if each_line_type not in ["list", "dict", "record"]:
+            raise  Exceptions.ArgValueError("each_line_type must be list, dict or record")
+        return Reader._batched(Reader._iter_csv(file_path, mode, newline, each_line_type, start_line, max_read_lines, encoding, use_index, compression), batch_size)
+
+    @staticmethod
+    def seek_csv(f, file_path, start_line, each_line_type="dict"):
+        # move f to the first record at or after start_line using the sidecar index, returns the fieldnames
+        # of a dict reader and the start_line still to be applied to csv reader's line_num
+        fieldnames = None
+        if start_line <= 1:
+            return fieldnames, start_line
+        Reader._check_indexable(f)
+        index = LineIndex.load(file_path, csv_mode=True)
+        offset = index.offset_of_line(start_line)
+        if each_line_type == "dict":
+            fieldnames = next(csv.reader(f), None)
+            if offset == 0:
+                offset = index.offset_of_record(1)
+        f.seek(offset if offset is not None else os.fstat(f.fileno()).st_size)
+        return fieldnames, 1
+
+    @staticmethod
+    def _iter_csv(file_path, mode, newline, each_line_type, start_line, max_read_lines, encoding, use_index, compression="infer"):
         read_lines_count = 0
-        with open(file=file_path, mode=mode, encoding=encoding, newline=newline) as f:
+        with open_file(file_path, mode=mode, encoding=encoding, newline=newline, compression=compression) as f:
+            fieldnames = None
+            if use_index:
+                fieldnames, start_line = Reader.seek_csv(f, file_path, start_line, "list" if each_line_type == "list" else "dict")
             if each_line_type == "list":
                 csv_iter = csv.reader(f)
-                for line in csv_iter:
-                    if csv_iter.line_num < start_line:
-                        continue
-                    if not max_read_lines and max_read_lines != 0:
-                        res.append(line)
-                        continue
-                    read_lines_count += 1
-                    if read_lines_count <= max_read_lines:
-                        res.append(line)
-                    else:
-                        break
-
             elif each_line_type == "dict":
-                csv_iter = csv.DictReader(f)
-                for line in csv_iter:
-                    if csv_iter.line_num < start_line:
-                        continue
-                    if not max_read_lines and max_read_lines != 0:
-                        res.append(dict(line))
-                        continue
+                csv_iter = csv.DictReader(f, fieldnames=fieldnames)
+            elif each_line_type == "record":
+                csv_iter = csv.reader(f)
+                if fieldnames is None:
+                    fieldnames = next(csv_iter, None)
+                make = Schema(fieldnames or []).make
+            for line in csv_iter:
+                if csv_iter.line_num < start_line:
+                    continue
+                if each_line_type == "record" and not line:
+                    continue
+                if max_read_lines is not None:
                     read_lines_count += 1
-                    if read_lines_count <= max_read_lines:
-                        res.append(dict(line))
-                    else:
+                    if read_lines_count > max_read_lines:
                         break
+                if each_line_type == "dict":
+                    yield dict(line)
+                elif each_line_type == "record":
+                    yield make(line)
+                else:
+                    yield line
+
+    @staticmethod
+    def read_csv_columns(file_path, dtypes=None, columns=None, sample_size=1000, chunk_size=10000, mode="r", newline=None, start_line=1, max_read_lines=None, encoding="utf-8", use_index=False, compression="infer", **kwargs):
+        # {column: numpy array}, types from dtypes or inferred from the first sample_size rows
+        from .csv.ColumnUtils import ColumnBuilder
+        chunks = Reader._iter_csv_chunks(file_path, mode, newline, start_line, max_read_lines, encoding, use_index, chunk_size, compression)
+        try:
+            builder = ColumnBuilder(next(chunks), dtypes=dtypes, columns=columns, sample_size=sample_size)
+            for chunk in chunks:
+                builder.append(chunk)
+        finally:
+            chunks.close()
+        res = builder.result()
+        if builder.stale:
+            # columns widened to object late in the file are read again as text
+            stale = [c for c in builder.columns if c in builder.stale]
+            chunks = Reader._iter_csv_chunks(file_path, mode, newline, start_line, max_read_lines, encoding, use_index, chunk_size, compression)
+            try:
+                again = ColumnBuilder(next(chunks), dtypes={c: builder.dtypes[c] for c in stale}, columns=stale)
+                for chunk in chunks:
+                    again.append(chunk)
+            finally:
+                chunks.close()
+            res.update(again.result())
+            res = {c: res[c] for c in builder.columns}
         return res
 
-        
     @staticmethod
-    def read_json(file_path, encoding="utf-8"):
-        with open(file_path,encoding=encoding) as f:
+    def iter_csv_columns(file_path, dtypes=None, columns=None, sample_size=1000, batch_size=10000, mode="r", newline=None, start_line=1, max_read_lines=None, encoding="utf-8", use_index=False, compression="infer", **kwargs):
+        from .csv.ColumnUtils import ColumnBuilder
+        chunks = Reader._iter_csv_chunks(file_path, mode, newline, start_line, max_read_lines, encoding, use_index, batch_size, compression)
+        try:
+            builder = ColumnBuilder(next(chunks), dtypes=dtypes, columns=columns, sample_size=sample_size)
+            for chunk in chunks:
+                yield builder.convert(chunk)
+        finally:
+            chunks.close()
+
+    @staticmethod
+    def _iter_csv_chunks(file_path, mode, newline, start_line, max_read_lines, encoding, use_index, chunk_size, compression):
+        # yields the header first, even when start_line is past it, then lists of chunk_size rows
+        with open_file(file_path, mode=mode, encoding=encoding, newline=newline, compression=compression) as f:
+            header = None
+            if use_index:
+                header, start_line = Reader.seek_csv(f, file_path, start_line, "dict")
+            csv_iter = csv.reader(f)
+            yield header if header is not None else next(csv_iter, None)
+            lines = (line for line in csv_iter if line and csv_iter.line_num >= start_line)
+            yield from Reader._batched(islice(lines, max_read_lines), chunk_size)
+
+    @staticmethod
+    def _batched(it, batch_size):
+        if not batch_size:
+            return it
+        return iter(lambda: list(islice(it, batch_size)), [])
+
+    @staticmethod
+    def read_json(file_path, encoding="utf-8", compression="infer"):
+        with open_file(file_path, encoding=encoding, compression=compression) as f:
             res = json.load(f)
         return res
 
     @staticmethod
-    def read_anyfile(file_path, mode="r",newline=None, start_line=1, max_read_lines=None, line_by_line=False,encoding="utf-8", **kwargs):
+    def read_jsonl(file_path, start_line=1, max_read_lines=None, encoding="utf-8", use_index=False, compression="infer", **kwargs):
+        return list(Reader.iter_jsonl(file_path, start_line=start_line, max_read_lines=max_read_lines, encoding=encoding, use_index=use_index,
+                                      compression=compression))
+
+    @staticmethod
+    def iter_jsonl(file_path, start_line=1, max_read_lines=None, encoding="utf-8", batch_size=None, use_index=False, compression="infer", **kwargs):
+        each = Reader._iter_jsonl(file_path, start_line, max_read_lines, encoding, batch_size or 1000, use_index, compression)
+        if batch_size:
+            return each
+        return (obj for objs in each for obj in objs)
+
+    @staticmethod
+    def _iter_jsonl(file_path, start_line, max_read_lines, encoding, batch_size, use_index, compression="infer"):
+        # lines are decoded a batch at a time, blank lines are skipped
+        read_lines_count = 0
+        with open_file(file_path, mode="rb", compression=compression) as f:
+            if use_index:
+                start_line = Reader.seek_lines(f, file_path, start_line)
+            lines = islice(f, start_line - 1, None) if start_line > 1 else f
+            while max_read_lines is None or read_lines_count < max_read_lines:
+                size = batch_size if max_read_lines is None else min(batch_size, max_read_lines - read_lines_count)
+                raw = list(islice(lines, size))
+                if not raw:
+                    break
+                each = JsonUtils.loads_lines(raw, encoding=encoding)
+                if each:
+                    read_lines_count += len(each)
+                    yield each
+
+    @staticmethod
+    def read_anyfile(file_path, mode="r",newline=None, start_line=1, max_read_lines=None, line_by_line=False,encoding="utf-8", use_index=False, compression="infer", **kwargs):
         res = []
         read_lines_count = 0
-        with open(file=file_path, mode=mode, encoding=encoding, newline=newline) as f:
+        with open_file(file_path, mode=mode, encoding=encoding, newline=newline, compression=compression) as f:
+            if use_index and max_read_lines is not None:
+                start_line = Reader.seek_lines(f, file_path, start_line)
             if not max_read_lines and max_read_lines != 0:
                 if not line_by_line:
                     res = f.read()
                 else:
-                    for line in f.readlines():
+                    for line in f:
                         res.append(line.strip("\n"))
                 return res
 
@@ -77,3 +193,39 @@ class Reader(object):
             if not line_by_line:
                 res = "".join(res)
         return res
+
+    @staticmethod
+    def iter_lines(file_path, mode="r", newline=None, start_line=1, max_read_lines=None, encoding="utf-8", keep_newline=False, batch_size=None, use_index=False,
+                   compression="infer", **kwargs):
+        return Reader._batched(Reader._iter_lines(file_path, mode, newline, start_line, max_read_lines, encoding, keep_newline, use_index, compression), batch_size)
+
+    @staticmethod
+    def seek_lines(f, file_path, start_line):
+        # move f to start_line using the sidecar index, returns the start_line still to be skipped
+        if start_line <= 1:
+            return start_line
+        Reader._check_indexable(f)
+        offset = LineIndex.load(file_path).offset_of_line(start_line)
+        f.seek(offset if offset is not None else os.fstat(f.fileno()).st_size)
+        return 1
+
+    @staticmethod
+    def _check_indexable(f):
+        # the sidecar index holds offsets into the file on disk, not into the decompressed stream
+        if is_compressed(f):
+            raise Exceptions.ParamsError("use_index needs an uncompressed file")
+
+    @staticmethod
+    def _iter_lines(file_path, mode, newline, start_line, max_read_lines, encoding, keep_newline, use_index, compression="infer"):
+        read_lines_count = 0
+        with open_file(file_path, mode=mode, encoding=encoding, newline=newline, compression=compression) as f:
+            if use_index:
+                start_line = Reader.seek_lines(f, file_path, start_line)
+            for i, line in enumerate(f, 1):
+                if i < start_line:
+                    continue
+                if max_read_lines is not None:
+                    read_lines_count += 1
+                    if read_lines_count > max_read_lines:
+                        break
+                yield line if keep_newline else line.strip("\n")
@@ -0,0 +1,123 @@
+import io
+import asyncio
+import os
+import csv
+import mmap
+from .utils import Exceptions
+from .utils.BatchPool import BatchPool
+from .utils.Compression import detect
+from .csv.Record import get_schema
+
+
+def _bind_shard(file_path, file_type, each_line_type, fieldnames, encoding):
+    def read_shard(shard):
+        start, end = shard
+        with open(file_path, "rb") as f:
+            f.seek(start)
+            text = f.read(end - start).decode(encoding)
+        buf = io.StringIO(text, newline=None)
+        if file_type == "lines":
+            return [line.strip("\n") for line in buf]
+        if each_line_type == "dict":
+            return [dict(line) for line in csv.DictReader(buf, fieldnames=fieldnames)]
+        if each_line_type == "record":
+            make = get_schema(tuple(fieldnames)).make
+            return [make(line) for line in csv.reader(buf) if line]
+        return list(csv.reader(buf))
+    return read_shard
+
+
+def _next_boundary(mm, pos, size, quotes, csv_mode):
+    # first record start after pos, a newline inside a quoted csv field is not a boundary
+    while pos < size:
+        nl = mm.find(b"\n", pos)
+        if nl == -1:
+            return size, quotes
+        if csv_mode:
+            quotes += mm[pos:nl].count(b'"')
+        pos = nl + 1
+        if not csv_mode or quotes % 2 == 0:
+            return pos, quotes
+    return size, quotes
+
+
+class ShardedReader(object):
+    # splits a csv/line file into byte ranges aligned to record boundaries and parses them on a process pool
+    def __init__(self, file_path, file_type="csv", each_line_type="dict", batch_size=1000, processes=None, shard_size=8*1024*1024,
+                 ordered=True, encoding="utf-8", **kwargs):
+        if file_type not in ["csv", "lines"]:
+            raise Exceptions.ArgValueError("file_type must be csv or lines")
+        if each_line_type not in ["list", "dict", "record"]:
+            raise Exceptions.ArgValueError("each_line_type must be list, dict or record")
+        self.file_path = file_path
+        self.file_type = file_type
+        self.each_line_type = each_line_type
+        self.batch_size = batch_size
+        self.processes = processes
+        self.shard_size = shard_size
+        self.ordered = ordered
+        self.encoding = encoding
+        self.fieldnames = None
+
+    def get_shards(self):
+        if detect(self.file_path) is not None:
+            raise Exceptions.ParamsError("compressed files can not be split into shards, read them with Reader or the async readers")
+        csv_mode = self.file_type == "csv"
+        shards = []
+        with open(self.file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return shards
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start, quotes = 0, 0
+                if csv_mode and self.each_line_type != "list":
+                    # the header is parsed here once and handed to every shard
+                    start, quotes = _next_boundary(mm, 0, size, 0, csv_mode)
+                    header = mm[:start].decode(self.encoding)
+                    self.fieldnames = next(csv.reader(io.StringIO(header, newline=None)), [])
+                scanned = start
+                while start < size:
+                    target = start + self.shard_size
+                    if target >= size:
+                        shards.append((start, size))
+                        break
+                    if csv_mode:
+                        quotes += mm[scanned:target].count(b'"')
+                    end, quotes = _next_boundary(mm, target, size, quotes, csv_mode)
+                    shards.append((start, end))
+                    start = scanned = end
+        return shards
+
+    def _get_pool(self):
+        args = (self.file_path, self.file_type, self.each_line_type, self.fieldnames, self.encoding)
+        return BatchPool(_bind_shard, args=args, processes=self.processes, chunksize=1, ordered=self.ordered, plain=False)
+
+    def _split_batches(self, each_list):
+        n = len(each_list) // self.batch_size * self.batch_size
+        batches = [each_list[i:i+self.batch_size] for i in range(0, n, self.batch_size)]
+        del each_list[:n]
+        return batches
+
+    def __iter__(self):
+        shards = self.get_shards()
+        each_list = []
+        with self._get_pool() as pool:
+            for rows in pool.imap(shards):
+                each_list.extend(rows)
+                yield from self._split_batches(each_list)
+        if each_list:
+            yield each_list
+
+    def __aiter__(self):
+        return self._aiter()
+
+    async def _aiter(self):
+        shards = await asyncio.get_running_loop().run_in_executor(None, self.get_shards)
+        each_list = []
+        async with self._get_pool() as pool:
+            async for rows in pool.aimap(shards):
+                each_list.extend(rows)
+                for batch in self._split_batches(each_list):
+                    yield batch
+        if each_list:
+            yield each_list
@@ -1,45 +1,131 @@
+import os
 import csv
 import json
+from itertools import islice
+from contextlib import contextmanager
 from .utils import Exceptions
+from .json import JsonUtils
+from .csv.Record import in_order
+from .utils.Compression import open_file, detect, is_compressed, CHUNK_SIZE
 
 
 class Writer(object):
+    # data can be any iterable (write_json: a dict or an iterable), it is written batch_size items at a time through a
+    # 1MB buffer into <file_path>.tmp<pid>, which replaces file_path once everything is written. mode="a" appends in place
     @staticmethod
-    def write_csv(data, file_path, mode="w", newline=None, each_line_type="dict", headers=None, encoding="utf-8"):
-        if not isinstance(data, list):
-            raise Exceptions.ArgValueError('data must be list type')
-        if each_line_type not in ["list", "dict"]:
-            raise  Exceptions.ArgValueError("each_line_type must be list or dict")
-        
-        with open(file=file_path, mode=mode, encoding=encoding, newline=newline) as f:
+    def write_csv(data, file_path, mode="w", newline=None, each_line_type="dict", headers=None, encoding="utf-8", compression="infer",
+                  batch_size=1000, fsync=True):
+        if isinstance(data, (dict, str)):
+            raise Exceptions.ArgValueError('data must be an iterable of rows')
+        if each_line_type not in ["list", "dict", "record"]:
+            raise  Exceptions.ArgValueError("each_line_type must be list, dict or record")
+        it = iter(data)
+        each = list(islice(it, batch_size))
+        with Writer.open_atomic(file_path, mode=mode, encoding=encoding, newline=newline, compression=compression, fsync=fsync) as f:
             if each_line_type == "list":
                 csv_iter = csv.writer(f)
                 if headers:
                     csv_iter.writerow(headers)
-                for line in data:
-                    csv_iter.writerow(line)
-                    
+
             elif each_line_type == "dict":
+                # the header comes from the first row
                 if not headers:
-                    headers = list(data[0].keys())
+                    headers = list(each[0].keys()) if each else []
                 csv_iter = csv.DictWriter(f,fieldnames=headers)
-                csv_iter.writeheader()
-                for line in data:
-                    csv_iter.writerow(line)
+                if headers:
+                    csv_iter.writeheader()
+
+            elif each_line_type == "record":
+                # records go out as the tuples they are, reordered only when headers differ from their schema
+                if not headers:
+                    headers = list(each[0].keys()) if each else []
+                csv_iter = csv.writer(f)
+                if headers:
+                    csv_iter.writerow(headers)
+
+            while each:
+                csv_iter.writerows(in_order(each, headers) if each_line_type == "record" else each)
+                each = list(islice(it, batch_size))
 
     @staticmethod
-    def write_json(data, file_path, mode="w", compress=False, encoding='utf-8', indent=2, sort_keys=True, ensure_ascii=False):
-        if not isinstance(data, dict) and not isinstance(data,list):
-            raise Exceptions.ArgValueError('data must be dict type')
-        with open(file_path, mode=mode, encoding=encoding) as f:
-            if compress:
-                json.dump(data, f)
+    def write_json(data, file_path, mode="w", compress=False, encoding='utf-8', indent=2, sort_keys=True, ensure_ascii=False, compression="infer",
+                   batch_size=1000, fsync=True):
+        # a dict is written whole, anything else iterable as a json array, encoded batch_size items at a time
+        if isinstance(data, (str, bytes)) or not (isinstance(data, dict) or hasattr(data, "__iter__")):
+            raise Exceptions.ArgValueError('data must be a dict or an iterable')
+        kwargs = {} if compress else {"indent": indent, "sort_keys": sort_keys, "ensure_ascii": ensure_ascii}
+        with Writer.open_atomic(file_path, mode=mode, encoding=encoding, compression=compression, fsync=fsync) as f:
+            if isinstance(data, dict):
+                f.write(json.dumps(data, **kwargs))
+                return
+            # same text as json.dump of the whole list
+            if compress or indent is None:
+                sep, first, last = ", ", "[", "]"
             else:
-                json.dump(data, f, indent=indent,sort_keys=sort_keys, ensure_ascii=ensure_ascii)
+                pad = "\n" + " " * indent if isinstance(indent, int) else "\n" + indent
+                sep, first, last = "," + pad, "[" + pad, "\n]"
+            it = iter(data)
+            each = list(islice(it, batch_size))
+            if not each:
+                f.write("[]")
+                return
+            f.write(first)
+            while each:
+                if compress or indent is None:
+                    f.write(sep.join([json.dumps(obj, **kwargs) for obj in each]))
+                else:
+                    f.write(sep.join([json.dumps(obj, **kwargs).replace("\n", pad) for obj in each]))
+                each = list(islice(it, batch_size))
+                if each:
+                    f.write(sep)
+            f.write(last)
+
+    @staticmethod
+    def write_jsonl(data, file_path, mode="w", encoding="utf-8", batch_size=1000, compression="infer", fsync=True):
+        if isinstance(data, (dict, str)):
+            raise Exceptions.ArgValueError('data must be an iterable of objects')
+        it = iter(data)
+        with Writer.open_atomic(file_path, mode=mode.replace("b", "") + "b", compression=compression, fsync=fsync) as f:
+            while True:
+                each = list(islice(it, batch_size))
+                if not each:
+                    break
+                f.write(JsonUtils.dumps_lines(each, encoding=encoding))
 
     @staticmethod
-    def write_anyfile(data, file_path, mode="w", encoding="utf=-8"):
+    def write_anyfile(data, file_path, mode="w", encoding="utf=-8", compression="infer", fsync=True):
         if not isinstance(data, str):
             raise Exceptions.ArgValueError('data must be str type')
-        with open(file_path, mode=mode, encoding=encoding) as f:
+        with Writer.open_atomic(file_path, mode=mode, encoding=encoding, compression=compression, fsync=fsync) as f:
             f.write(data)
+
+    @staticmethod
+    @contextmanager
+    def open_atomic(file_path, mode="w", encoding=None, newline=None, compression="infer", fsync=True):
+        # a crash or an exception in the block leaves file_path as it was, never half written
+        codec = detect(file_path, mode, compression)
+        if "a" in mode:
+            with open_file(file_path, mode=mode, encoding=encoding, newline=newline, compression=codec, fsync=fsync, buffering=CHUNK_SIZE) as f:
+                yield f
+                Writer._sync(f, fsync)
+            return
+        if "x" in mode and os.path.exists(file_path):
+            raise FileExistsError("file exists: {!r}".format(file_path))
+        tmp_path = "{}.tmp{}".format(file_path, os.getpid())
+        try:
+            with open_file(tmp_path, mode=mode.replace("x", "w"), encoding=encoding, newline=newline, compression=codec, fsync=fsync,
+                           buffering=CHUNK_SIZE) as f:
+                yield f
+                Writer._sync(f, fsync)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _sync(f, fsync):
+        # compressed files sync themselves on close, after their trailer
+        if fsync and not is_compressed(f):
+            f.flush()
+            os.fsync(f.fileno())
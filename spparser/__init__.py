@@ -1,8 +1,42 @@
-from .Extractor import Extractor
-from .Parser import Parser
-from .Reader import Reader
-from .Writer import Writer
-from .AsyncReader import async_csv_reader
-from .AsyncWriter import async_csv_writer
+import sys
+import types
+import importlib
 
 __version__="0.4.10"
+
+# public name -> submodule, imported on first access so that e.g. Reader does not load lxml, motor or aiomysql
+_LAZY = {
+    "Extractor": "Extractor",
+    "Document": "Document",
+    "Parser": "Parser",
+    "Reader": "Reader",
+    "ShardedReader": "ShardedReader",
+    "Writer": "Writer",
+    "async_csv_reader": "AsyncReader",
+    "async_csv_writer": "AsyncWriter",
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + _LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # importing the submodule spparser.Reader binds it on the package, keep the Reader class there instead
+        if isinstance(value, types.ModuleType) and _LAZY.get(name) == name:
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
@@ -1,52 +1,179 @@
-from pyquery import PyQuery as pq
+import importlib.util
+from copy import deepcopy
+from lxml import etree
 from ..utils import Exceptions
+from ..utils.LRUCache import LRUCache
+from ..xpath.XpathUtils import compile_xpath
+from .NodeUtils import inner_html, node_text, remove_node
+
+# css selector -> compiled etree.XPath, translated once per (selector, prefix)
+css_cache = LRUCache(maxsize=1024)
+# pyquery is slow to import, it is loaded by the first selector that needs translating
+_translator = None
+_pq = None
+
+
+def _get_translator():
+    global _translator
+    if _translator is None:
+        try:
+            from pyquery.cssselectpatch import JQueryTranslator as Translator
+        except ImportError:
+            from cssselect import HTMLTranslator as Translator
+        _translator = Translator(xhtml=False)
+    return _translator
+
+
+def pq(*args, **kwargs):
+    global _pq
+    if _pq is None:
+        from pyquery import PyQuery
+        _pq = PyQuery
+    return _pq(*args, **kwargs)
+
+
+def has_pyquery():
+    return _pq is not None or importlib.util.find_spec("pyquery") is not None
+
+
+def compile_css(css_exp, prefix="descendant-or-self::"):
+    key = (css_exp, prefix)
+    compiled = css_cache.get(key)
+    if compiled is None:
+        compiled = compile_xpath(_get_translator().css_to_xpath(css_exp.replace("[@", "["), prefix))
+        css_cache.put(key, compiled)
+    return compiled
+
+
+def css_root(text):
+    # the root PyQuery(text) selects from: the xml tree of well formed text, else lxml.html's element for a
+    # fragment or its document for a whole page, so both engines see the same nodes
+    if isinstance(text, str) and not text.strip():
+        return None
+    try:
+        return etree.fromstring(text)
+    except etree.XMLSyntaxError:
+        import lxml.html
+        return lxml.html.fromstring(text)
+
 
 class CssUtils(object):
-    def __init__(self, css_exp, text, result_type="text", attr_name=None, remove_tags_exp=None):
+    def __init__(self, css_exp, text=None, result_type="text", attr_name=None, remove_tags_exp=None, tree=None, engine="lxml"):
         self.css_exp = css_exp
         self.text = text
+        self.tree = tree
         self.result_type = result_type
         self.attr_name = attr_name
         self.remove_tags_exp = remove_tags_exp
+        self.engine = engine
         if result_type not in ["text", "html", "attr"]:
             raise Exceptions.ArgValueError('result_type must be "text", "html" or "attr"') 
+        if engine not in ["lxml", "pyquery"]:
+            raise Exceptions.ArgValueError('engine must be "lxml" or "pyquery"')
+        if engine == "pyquery" and not has_pyquery():
+            raise Exceptions.ArgValueError('engine "pyquery" requires pyquery to be installed')
+
+    def _get_root(self):
+        if self.tree is None:
+            self.tree = css_root(self.text)
+        return self.tree
+
+    def _select_first(self, root):
+        return compile_css(self.css_exp)(root)
+
+    def _select_all(self, root):
+        # same scope as PyQuery.find(): the selector is matched inside each child of the root
+        xpath = compile_css(self.css_exp)
+        return [node for child in root for node in xpath(child)]
+
+    def _strip_tags(self, node):
+        for tag in compile_css(self.remove_tags_exp)(node):
+            remove_node(tag)
+
+    def _render(self, node):
+        if self.result_type == "html":
+            return inner_html(node)
+        elif self.result_type == "text":
+            return node_text(node)
+        return node.get(self.attr_name)
 
     def extract_first(self):
-        doc = pq(self.text)
+        if self.engine == "pyquery":
+            return self._pq_extract_first()
+        root = self._get_root()
+        if root is None:
+            return None
+        nodes = self._select_first(root)
+        if not nodes:
+            return None
+        node = nodes[0]
+        if self.result_type == "attr":
+            return node.get(self.attr_name)
+        if self.remove_tags_exp:
+            # the tree may be shared by other extractions, so strip the tags from a private copy of the node
+            node = deepcopy(node)
+            self._strip_tags(node)
+        # extract_first always returned the inner html, for "text" as well
+        return inner_html(node)
+
+    def extract_all(self):
+        if self.engine == "pyquery":
+            return self._pq_extract_all()
+        root = self._get_root()
+        if root is None:
+            return []
+        if self.remove_tags_exp and self.result_type != "attr":
+            # copy the document once and strip every matched tag in a single pass
+            root = deepcopy(root)
+            nodes = self._select_all(root)
+            self._strip_tags(root)
+        else:
+            nodes = self._select_all(root)
+        return [self._render(node) for node in nodes]
+
+    def _pq_get_doc(self):
+        # always a fresh document from the text, exactly what this engine did before lxml, never the shared tree
+        return pq(self.text)
+
+    def _pq_remove_tags(self, item):
+        return item.remove(self.remove_tags_exp)
+
+    def _pq_extract_first(self):
+        doc = self._pq_get_doc()
         pos = doc(self.css_exp)
         if not pos:
             return None
         if self.result_type == "html":
             for i in pos.items():
                 if self.remove_tags_exp:
-                    i = i.remove(self.remove_tags_exp)
+                    i = self._pq_remove_tags(i)
                 return i.html()
 
         elif self.result_type == "text":
             for i in pos.items():
                 if self.remove_tags_exp:
-                    i = i.remove(self.remove_tags_exp)
+                    i = self._pq_remove_tags(i)
                 return i.html()
 
         elif self.result_type == "attr":
             res = pos.attr(self.attr_name)
             return res
 
-    def extract_all(self):
-        doc = pq(self.text)
+    def _pq_extract_all(self):
+        doc = self._pq_get_doc()
         pos = doc.find(self.css_exp)
         res = []
         if self.result_type == "html":
             for i in pos.items():
                 if self.remove_tags_exp:
-                    i = i.remove(self.remove_tags_exp)
+                    i = self._pq_remove_tags(i)
                 res.append(i.html())
             return res
 
         elif self.result_type == "text":
             for i in pos.items():
                 if self.remove_tags_exp:
-                    i = i.remove(self.remove_tags_exp)
+                    i = self._pq_remove_tags(i)
                 res.append(i.text())
             return res
 
@@ -0,0 +1,112 @@
+import re
+from html import escape
+from lxml import etree
+
+# text()/html() of a single lxml node, producing the same output as PyQuery's text()/html()
+
+INLINE_TAGS = {
+    'a', 'abbr', 'acronym', 'b', 'bdo', 'big', 'br', 'button', 'cite',
+    'code', 'dfn', 'em', 'i', 'img', 'input', 'kbd', 'label', 'map',
+    'object', 'q', 'samp', 'script', 'select', 'small', 'span', 'strong',
+    'sub', 'sup', 'textarea', 'time', 'tt', 'var'
+}
+
+SEPARATORS = {'br'}
+
+WHITESPACE_RE = re.compile('[\x20\x09\x0C\u200B\x0A\x0D]+')
+
+
+def inner_html(node, escape_text=True):
+    html = node.text or ''
+    if escape_text:
+        html = escape(html, quote=False)
+    if len(node) == 0:
+        return html
+    return html + ''.join([etree.tostring(child, encoding=str) for child in node])
+
+
+def node_text(node):
+    if node.tag == 'textarea':
+        return inner_html(node, escape_text=False)
+    parts = _text_parts(node)
+    parts = _strip_block_nl(_squash_block_nl(_merge_text_parts(parts)))
+    # None marks a block boundary, True marks a <br>
+    return ''.join('\n' if x is None or x is True else x for x in parts).strip()
+
+
+def remove_node(node):
+    parent = node.getparent()
+    if parent is None:
+        return
+    if node.tail:
+        prev = node.getprevious()
+        if prev is None:
+            parent.text = (parent.text or '') + node.tail
+        else:
+            prev.tail = (prev.tail or '') + node.tail
+    parent.remove(node)
+
+
+def _text_parts(node, top=True):
+    if callable(node.tag):
+        return []
+    parts = []
+    if node.tag in SEPARATORS:
+        parts.append(True)
+    elif node.tag not in INLINE_TAGS:
+        parts.append(None)
+    if node.text is not None:
+        parts.append(node.text)
+    for child in node:
+        parts.extend(_text_parts(child, top=False))
+        if child.tail is not None:
+            parts.append(child.tail)
+    if node.tag not in INLINE_TAGS and node.tag not in SEPARATORS:
+        parts.append(None)
+    if top:
+        parts = _strip_block_nl(_squash_block_nl(parts))
+    return parts
+
+
+def _squash_block_nl(parts):
+    output, last_nl = [], False
+    for x in parts:
+        if x is not None:
+            output.append(x)
+            last_nl = False
+        elif not last_nl:
+            output.append(None)
+            last_nl = True
+    return output
+
+
+def _strip_block_nl(parts):
+    if not parts:
+        return parts
+    for start_idx, pt in enumerate(parts):
+        if isinstance(pt, str):
+            break
+    for end_idx, pt in enumerate(parts[:start_idx - 1 if start_idx > 0 else None:-1]):
+        if isinstance(pt, str):
+            break
+    return parts[start_idx:-end_idx if end_idx > 0 else None]
+
+
+def _merge_text_parts(parts):
+    output, buf = [], []
+
+    def flush():
+        if buf:
+            item = WHITESPACE_RE.sub(' ', ''.join(buf)).strip()
+            if item:
+                output.append(item)
+            buf[:] = []
+
+    for x in parts:
+        if not isinstance(x, str):
+            flush()
+            output.append(x)
+        else:
+            buf.append(x)
+    flush()
+    return output
@@ -1 +1 @@
-from .CssUtils import CssUtils
+from .CssUtils import CssUtils, compile_css, css_cache, css_root
@@ -0,0 +1,176 @@
+from itertools import zip_longest
+from ..utils import Exceptions
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_BOOLS = {"true": True, "false": False}
+
+
+def infer_dtype(values):
+    # int64, float64 (also ints with blanks, which become nan), bool, else object holding the str values
+    filled = [v for v in values if v != ""]
+    if not filled:
+        return np.dtype(object)
+    try:
+        np.array(filled, dtype=np.int64)
+        return np.dtype(np.int64) if len(filled) == len(values) else np.dtype(np.float64)
+    except (ValueError, OverflowError):
+        pass
+    try:
+        np.array(filled, dtype=np.float64)
+        return np.dtype(np.float64)
+    except ValueError:
+        pass
+    if len(filled) == len(values) and all(v.lower() in _BOOLS for v in filled):
+        return np.dtype(bool)
+    return np.dtype(object)
+
+
+def _promote(dtype):
+    # next dtype to try when a later chunk does not fit the inferred one
+    if dtype.kind in "iu":
+        return np.dtype(np.float64)
+    return np.dtype(object)
+
+
+def convert(values, dtype):
+    if dtype.kind == "O":
+        return np.array(values, dtype=object)
+    if dtype.kind == "b":
+        try:
+            return np.array([_BOOLS[v.lower()] for v in values], dtype=bool)
+        except KeyError as e:
+            raise ValueError("invalid literal for bool: {!r}".format(e.args[0]))
+    if dtype.kind in "fc":
+        values = [v if v != "" else "nan" for v in values]
+    elif dtype.kind == "M":
+        values = [v if v != "" else "NaT" for v in values]
+    return np.array(values, dtype=dtype)
+
+
+def _fixed_dtype(dtype):
+    dtype = np.dtype(dtype)
+    # str without a width would truncate every value to "", keep python strs instead
+    if dtype.kind in "SU" and dtype.itemsize == 0:
+        return np.dtype(object)
+    return dtype
+
+
+class ColumnBuffer(object):
+    # a typed array that grows by doubling, so appending chunks costs amortized O(1) per value
+    def __init__(self, dtype, capacity=1024):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def append(self, chunk):
+        need = self.size + len(chunk)
+        if need > len(self.data):
+            data = np.empty(max(need, 2 * len(self.data)), dtype=self.data.dtype)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+        self.data[self.size:need] = chunk
+        self.size = need
+
+    def result(self):
+        return self.data[:self.size].copy() if self.size < len(self.data) else self.data
+
+
+class ColumnBuilder(object):
+    def __init__(self, header, dtypes=None, columns=None, sample_size=1000):
+        if np is None:
+            raise Exceptions.ParamsError("columnar reading requires numpy")
+        header = list(header or [])
+        columns = list(columns) if columns is not None else header
+        missing = [c for c in columns if c not in header]
+        if missing:
+            raise Exceptions.ArgValueError("columns not in the csv header: {}".format(missing))
+        self.header = header
+        self.columns = columns
+        self.indexes = [header.index(c) for c in columns]
+        self.fixed = {c: _fixed_dtype(d) for c, d in (dtypes or {}).items()}
+        self.sample_size = sample_size
+        self.dtypes = None
+        self.buffers = None
+        # raw cells of the inferred columns, kept only while everything buffered is within the first
+        # sample_size rows, so a column widened to object can be rebuilt from its text
+        self.raw = None
+        # columns widened to object once their raw cells were gone, their buffers are dropped and
+        # read_csv_columns reads them again in a second pass
+        self.stale = set()
+        self.size = 0
+
+    def convert(self, rows):
+        # one chunk of csv rows -> {column: array}, dtypes not given are inferred from the first chunk
+        # and promoted (int -> float -> object) when a later value does not fit
+        return self._convert(self._columns(rows), rows)
+
+    def _columns(self, rows):
+        cols = list(zip_longest(*rows, fillvalue=""))
+        if len(cols) < len(self.header):
+            cols.extend([("",) * len(rows)] * (len(self.header) - len(cols)))
+        return cols
+
+    def _convert(self, cols, rows):
+        if self.dtypes is None:
+            sample = rows[:self.sample_size]
+            self.dtypes = {}
+            for c, i in zip(self.columns, self.indexes):
+                self.dtypes[c] = self.fixed[c] if c in self.fixed else infer_dtype([row[i] if i < len(row) else "" for row in sample])
+        res = {}
+        for c, i in zip(self.columns, self.indexes):
+            dtype = self.dtypes[c]
+            while True:
+                try:
+                    res[c] = convert(cols[i], dtype)
+                    break
+                except (ValueError, OverflowError) as e:
+                    if c in self.fixed or dtype.kind == "O":
+                        raise Exceptions.ArgValueError("column {!r} can not be read as {}: {}".format(c, dtype, e))
+                    dtype = _promote(dtype)
+            if dtype != self.dtypes[c]:
+                self.dtypes[c] = dtype
+                if self.buffers is not None:
+                    self._rebuild(c, dtype)
+        return res
+
+    def _rebuild(self, c, dtype):
+        if dtype.kind != "O":
+            # int -> float, the parsed values convert exactly
+            self.buffers[c].data = self.buffers[c].data.astype(dtype)
+            return
+        if self.raw is None:
+            # re-stringifying parsed values would lose the text ("01" -> "1"), leave it to a second pass
+            self.stale.add(c)
+            self.buffers[c] = None
+            return
+        # re-read the column from its raw cells, so "01" stays "01" instead of "1"
+        buf = ColumnBuffer(dtype, len(self.buffers[c].data))
+        for cells in self.raw[c]:
+            buf.append(convert(cells, dtype))
+        self.buffers[c] = buf
+        del self.raw[c]
+
+    def append(self, rows):
+        cols = self._columns(rows)
+        chunk = self._convert(cols, rows)
+        if self.buffers is None:
+            self.buffers = {c: ColumnBuffer(self.dtypes[c], max(1024, len(rows))) for c in self.columns}
+            self.raw = {c: [] for c in self.columns if c not in self.fixed and self.dtypes[c].kind != "O"}
+        self.size += len(rows)
+        if self.raw is not None and self.size > self.sample_size:
+            self.raw = None
+        for c, i in zip(self.columns, self.indexes):
+            if c in self.stale:
+                continue
+            self.buffers[c].append(chunk[c])
+            if self.raw is not None and c in self.raw:
+                self.raw[c].append(cols[i])
+
+    def result(self):
+        if self.buffers is None:
+            return {c: np.empty(0, dtype=self.fixed.get(c, object)) for c in self.columns}
+        return {c: self.buffers[c].result() for c in self.columns if c not in self.stale}
+
@@ -0,0 +1,90 @@
+from functools import lru_cache
+
+
+class Schema(object):
+    # field name -> index, one per file and shared by all of its records
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.index = {name: i for i, name in enumerate(self.fields)}
+        self.record = type("Record", (Record,), {"__slots__": (), "_schema": self})
+
+    def make(self, row):
+        # short rows are padded with None and extra values dropped, as csv.DictReader's restval does
+        n = len(self.fields)
+        if len(row) != n:
+            row = row[:n] if len(row) > n else list(row) + [None] * (n - len(row))
+        return tuple.__new__(self.record, row)
+
+    def __repr__(self):
+        return "Schema({!r})".format(list(self.fields))
+
+    def __reduce__(self):
+        return get_schema, (self.fields,)
+
+
+@lru_cache(maxsize=128)
+def get_schema(fields):
+    # one schema per field list, records unpickled in another process share it again
+    return Schema(fields)
+
+
+def _rebuild(fields, values):
+    return tuple.__new__(get_schema(fields).record, values)
+
+
+class Record(tuple):
+    # a row as a tuple, read by index, by key (rec["name"]) or by attribute (rec.name) for fields that are
+    # identifiers and not tuple/Record methods. keys() and get() make it usable where a dict row is expected
+    __slots__ = ()
+    _schema = None
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                key = self._schema.index[key]
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name):
+        i = self._schema.index.get(name)
+        if i is None:
+            raise AttributeError("record has no field {!r}".format(name))
+        return tuple.__getitem__(self, i)
+
+    def get(self, key, default=None):
+        i = self._schema.index.get(key)
+        return default if i is None else tuple.__getitem__(self, i)
+
+    def keys(self):
+        return self._schema.index.keys()
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return zip(self._schema.fields, self)
+
+    def as_dict(self):
+        return dict(zip(self._schema.fields, self))
+
+    def __repr__(self):
+        return "Record({})".format(", ".join("{}={!r}".format(k, v) for k, v in zip(self._schema.fields, self)))
+
+    def __reduce__(self):
+        return _rebuild, (self._schema.fields, tuple(self))
+
+
+def in_order(records, fields):
+    # the records as rows in fields order, passed through untouched when their schema already is in that order
+    fields = tuple(fields)
+    picks = {}
+    for rec in records:
+        schema = rec._schema
+        pick = picks.get(schema)
+        if pick is None:
+            pick = picks[schema] = () if schema.fields == fields else tuple(schema.index.get(f) for f in fields)
+        if not pick:
+            yield rec
+        else:
+            yield ["" if i is None else rec[i] for i in pick]
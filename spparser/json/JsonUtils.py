@@ -0,0 +1,63 @@
+import json
+from ..csv.Record import Record
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+backend = "orjson" if orjson is not None else "json"
+
+_INF = float("inf")
+
+
+def loads(line):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def _default(obj):
+    # csv Records are written as objects
+    if isinstance(obj, Record):
+        return obj.as_dict()
+    raise TypeError
+
+
+def _like_orjson(obj):
+    # the json module writes tuples (so Records) as arrays without asking default, and nan/inf as NaN/Infinity
+    # where orjson writes null, so nested values are converted first
+    if isinstance(obj, Record):
+        obj = obj.as_dict()
+    if isinstance(obj, dict):
+        return {k: _like_orjson(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_like_orjson(v) for v in obj]
+    if isinstance(obj, float) and (obj != obj or obj in (_INF, -_INF)):
+        return None
+    return obj
+
+
+def dumps(obj):
+    # compact utf-8 bytes, same output with both backends
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default)
+        except TypeError:
+            pass
+    return json.dumps(_like_orjson(obj), default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads_lines(lines, encoding="utf-8"):
+    if encoding.replace("-", "").lower() != "utf8":
+        lines = [line.decode(encoding) for line in lines]
+    return [loads(line) for line in lines if line.strip()]
+
+
+def dumps_lines(objs, encoding="utf-8"):
+    if not objs:
+        return b""
+    res = b"\n".join([dumps(obj) for obj in objs]) + b"\n"
+    if encoding.replace("-", "").lower() != "utf8":
+        res = res.decode("utf-8").encode(encoding)
+    return res
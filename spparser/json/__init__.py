@@ -0,0 +1 @@
+from .JsonUtils import loads, dumps, loads_lines, dumps_lines, backend
@@ -0,0 +1,141 @@
+import sys
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+# the function of the current worker process, built once by _init_worker
+_worker_func = None
+_worker_plain = True
+
+
+def _init_worker(factory, args, plain):
+    global _worker_func, _worker_plain
+    _worker_func = factory(*args)
+    _worker_plain = plain
+
+
+def _run_chunk(chunk):
+    if not _worker_plain:
+        return [_worker_func(item) for item in chunk]
+    return [_plain(_worker_func(item)) for item in chunk]
+
+
+def _plain(value):
+    # lxml smart strings and elements keep a reference to their tree and cannot be sent back to the parent process
+    if isinstance(value, str):
+        return str(value)
+    # without lxml loaded there is no element to convert, and no reason to import it
+    etree = sys.modules.get("lxml.etree")
+    if etree is not None and isinstance(value, etree._Element):
+        return etree.tostring(value, encoding=str)
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_plain(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+def _chunks(items, chunksize):
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BatchPool(object):
+    def __init__(self, factory, args=(), processes=None, chunksize=32, ordered=True, max_pending=None, plain=True):
+        self.factory = factory
+        self.plain = plain
+        self.args = args
+        self.processes = processes
+        self.chunksize = chunksize
+        self.ordered = ordered
+        self.executor = None
+        self.max_pending = max_pending
+
+    def _get_executor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker, initargs=(self.factory, self.args, self.plain))
+        return self.executor
+
+    def _get_max_pending(self):
+        return self.max_pending or self._get_executor()._max_workers * 2
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    async def aclose(self):
+        # waiting for the workers to exit blocks, so it happens on a thread instead of the event loop
+        if self.executor is not None:
+            executor, self.executor = self.executor, None
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown, True)
+
+    def imap(self, items):
+        executor = self._get_executor()
+        max_pending = self._get_max_pending()
+        pending = deque()
+        for chunk in _chunks(items, self.chunksize):
+            pending.append(executor.submit(_run_chunk, chunk))
+            if len(pending) >= max_pending:
+                for res in self._pop_done(pending):
+                    yield from res
+        while pending:
+            for res in self._pop_done(pending):
+                yield from res
+
+    def map(self, items):
+        return list(self.imap(items))
+
+    def _pop_done(self, pending):
+        if self.ordered:
+            return [pending.popleft().result()]
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            pending.remove(fut)
+        return [fut.result() for fut in done]
+
+    async def amap(self, items):
+        return [res async for res in self.aimap(items)]
+
+    async def aimap(self, items):
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        max_pending = self._get_max_pending()
+        pending = deque()
+        for chunk in _chunks(items, self.chunksize):
+            pending.append(loop.run_in_executor(executor, _run_chunk, chunk))
+            if len(pending) >= max_pending:
+                for res in await self._apop_done(pending):
+                    for item in res:
+                        yield item
+        while pending:
+            for res in await self._apop_done(pending):
+                for item in res:
+                    yield item
+
+    async def _apop_done(self, pending):
+        if self.ordered:
+            return [await pending.popleft()]
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for fut in done:
+            pending.remove(fut)
+        return [fut.result() for fut in done]
@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+class FileCheckpointStore(object):
+    # every reader position in one small json file, rewritten atomically on each save
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read_all(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_all(self, data):
+        tmp_path = "{}.tmp{}".format(self.path, os.getpid())
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def load(self, name):
+        with self._lock:
+            return self._read_all().get(name)
+
+    def save(self, name, token):
+        with self._lock:
+            data = self._read_all()
+            data[name] = token
+            self._write_all(data)
+
+    def clear(self, name):
+        with self._lock:
+            data = self._read_all()
+            if data.pop(name, None) is not None:
+                self._write_all(data)
+
+
+class SqliteCheckpointStore(object):
+    # one row per reader, suits many readers sharing a store
+    def __init__(self, path, table="checkpoints"):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS {} (name TEXT PRIMARY KEY, token TEXT, updated REAL)".format(table))
+        self._conn.commit()
+
+    def load(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT token FROM {} WHERE name = ?".format(self.table), (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, name, token):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO {} (name, token, updated) VALUES (?, ?, ?)".format(self.table),
+                               (name, json.dumps(token, ensure_ascii=False, default=str), time.time()))
+            self._conn.commit()
+
+    def clear(self, name):
+        with self._lock:
+            self._conn.execute("DELETE FROM {} WHERE name = ?".format(self.table), (name,))
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,245 @@
+import io
+import os
+import queue
+import threading
+from . import Exceptions
+
+# compression="infer" looks at the magic bytes of a file being read and at the extension of one being written
+MAGIC = [(b"\x1f\x8b", "gzip"), (b"BZh", "bz2"), (b"\xfd7zXZ\x00", "xz"), (b"\x28\xb5\x2f\xfd", "zstd")]
+EXTENSIONS = {".gz": "gzip", ".gzip": "gzip", ".bz2": "bz2", ".xz": "xz", ".lzma": "xz", ".zst": "zstd", ".zstd": "zstd"}
+CODECS = ["gzip", "bz2", "xz", "zstd"]
+
+CHUNK_SIZE = 1024 * 1024
+QUEUE_DEPTH = 4
+
+
+def detect(file_path, mode="r", compression="infer"):
+    if compression is None or compression in CODECS:
+        return compression
+    if compression != "infer":
+        raise Exceptions.ArgValueError("compression must be infer, None or one of {}".format(CODECS))
+    if "r" in mode:
+        try:
+            with open(file_path, "rb") as f:
+                head = f.read(6)
+        except OSError:
+            return None
+        for magic, codec in MAGIC:
+            if head.startswith(magic):
+                return codec
+        return None
+    return EXTENSIONS.get(os.path.splitext(str(file_path))[1].lower())
+
+
+def _codec_stream(raw, mode, codec):
+    # a binary stream of the codec over the plain file object raw, which stays ours to close
+    if codec == "gzip":
+        import gzip
+        return gzip.GzipFile(fileobj=raw, mode=mode, compresslevel=6)
+    if codec == "bz2":
+        import bz2
+        return bz2.BZ2File(raw, mode=mode)
+    if codec == "xz":
+        import lzma
+        return lzma.LZMAFile(raw, mode=mode)
+    try:
+        import zstandard
+    except ImportError:
+        raise Exceptions.ParamsError("zstd compression requires the zstandard package")
+    if mode == "rb":
+        return zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=False)
+    return zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+
+
+def open_file(file_path, mode="r", encoding=None, newline=None, compression="infer", fsync=False, buffering=-1):
+    # open() that streams through gzip/bz2/xz/zstd, (de)compressing on a background thread. fsync applies to
+    # compressed output only, after the trailer is written on close
+    codec = detect(file_path, mode, compression)
+    if codec is None:
+        return open(file_path, mode=mode, encoding=encoding, newline=newline, buffering=buffering)
+    base = mode.replace("b", "").replace("t", "")
+    if "+" in base:
+        raise Exceptions.ArgValueError("compressed files can not be opened for update")
+    if "r" in base:
+        buffered = io.BufferedReader(ReadAhead(file_path, codec), CHUNK_SIZE)
+    else:
+        buffered = io.BufferedWriter(WriteBehind(file_path, base + "b", codec, fsync=fsync), CHUNK_SIZE)
+    if "b" in mode:
+        return buffered
+    return io.TextIOWrapper(buffered, encoding=encoding, newline=newline)
+
+
+def is_compressed(f):
+    raw = getattr(getattr(f, "buffer", f), "raw", None)
+    return isinstance(raw, (ReadAhead, WriteBehind))
+
+
+class ReadAhead(io.RawIOBase):
+    # decompressed chunks are read by a thread up to QUEUE_DEPTH ahead of the consumer. seeking is emulated:
+    # forward by reading on, backward by starting over, so tell()/seek() based resumes still work
+    def __init__(self, file_path, codec):
+        super().__init__()
+        self.name = file_path
+        self.codec = codec
+        self._pos = 0
+        self._thread = None
+
+    def _start(self):
+        self._raw = open(self.name, "rb")
+        self._stream = _codec_stream(self._raw, "rb", self.codec)
+        self._queue = queue.Queue(maxsize=QUEUE_DEPTH)
+        self._stop = threading.Event()
+        self._chunk = memoryview(b"")
+        self._eof = False
+        self._thread = threading.Thread(target=self._run, name="spparser-read-ahead", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                data = self._stream.read(CHUNK_SIZE)
+                self._put(data)
+                if not data:
+                    return
+        except BaseException as e:
+            self._put(e)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _shutdown(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        try:
+            self._stream.close()
+        finally:
+            self._raw.close()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        if self._thread is None:
+            self._start()
+        while not self._chunk:
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            if not item:
+                self._eof = True
+                return 0
+            self._chunk = memoryview(item)
+        n = min(len(b), len(self._chunk))
+        b[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        self._pos += n
+        return n
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("compressed files can only be seeked from the start or the current position")
+        if offset < self._pos:
+            self._shutdown()
+            self._pos = 0
+        scratch = bytearray(min(CHUNK_SIZE, max(offset - self._pos, 0)))
+        while self._pos < offset:
+            if not self.readinto(memoryview(scratch)[:offset - self._pos]):
+                break
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._shutdown()
+        super().close()
+
+
+class WriteBehind(io.RawIOBase):
+    # written chunks are compressed and written out by a thread, at most QUEUE_DEPTH of them in flight
+    def __init__(self, file_path, mode, codec, fsync=False):
+        super().__init__()
+        self.name = file_path
+        self.fsync = fsync
+        self._raw = open(file_path, mode)
+        try:
+            self._stream = _codec_stream(self._raw, mode.replace("x", "w"), codec)
+        except BaseException:
+            self._raw.close()
+            raise
+        self._pos = 0
+        self._error = None
+        self._queue = queue.Queue(maxsize=QUEUE_DEPTH)
+        self._thread = threading.Thread(target=self._run, name="spparser-write-behind", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            data = self._queue.get()
+            try:
+                if data is None:
+                    return
+                if self._error is None:
+                    self._stream.write(data)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._raise_error()
+        data = bytes(b)
+        self._queue.put(data)
+        self._pos += len(data)
+        return len(data)
+
+    def flush(self):
+        # everything handed over so far has gone through the compressor
+        if not self.closed:
+            self._queue.join()
+            self._raise_error()
+
+    def tell(self):
+        return self._pos
+
+    def fileno(self):
+        return self._raw.fileno()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._queue.put(None)
+            self._thread.join()
+            self._raise_error()
+            self._stream.close()
+            self._raw.flush()
+            if self.fsync:
+                os.fsync(self._raw.fileno())
+        finally:
+            self._raw.close()
+            super().close()
@@ -0,0 +1,119 @@
+import os
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+
+# sidecar header: magic, csv_mode, mtime_ns, size, records count
+_HEADER = struct.Struct("<8sBqQQ")
+_MAGIC = b"SPLIDX01"
+
+
+class LineIndex(object):
+    # byte offset of every line (or csv record) start, so start_line can be reached with one seek
+    def __init__(self, file_path, csv_mode=False, index_path=None):
+        self.file_path = file_path
+        self.csv_mode = csv_mode
+        self.index_path = index_path or "{}.{}.idx".format(file_path, "records" if csv_mode else "lines")
+        self.offsets = array("Q")
+        # csv only: physical line number on which each record ends, what csv reader's line_num reports
+        self.end_lines = array("Q")
+
+    @classmethod
+    def load(cls, file_path, csv_mode=False, index_path=None):
+        index = cls(file_path, csv_mode=csv_mode, index_path=index_path)
+        stat = os.stat(file_path)
+        if not index._read(stat):
+            index._build()
+            index._write(stat)
+        return index
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def offset_of_line(self, line_no):
+        # offset of the first line/record that a reader starting at line_no would return, None if past the end
+        if self.csv_mode:
+            i = bisect_left(self.end_lines, line_no)
+        else:
+            i = max(line_no, 1) - 1
+        if i >= len(self.offsets):
+            return None
+        return self.offsets[i]
+
+    def offset_of_record(self, i):
+        if i >= len(self.offsets):
+            return None
+        return self.offsets[i]
+
+    def _build(self):
+        self.offsets = array("Q")
+        self.end_lines = array("Q")
+        with open(self.file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if self.csv_mode:
+                    self._build_csv(mm, size)
+                else:
+                    self._build_lines(mm, size)
+
+    def _build_lines(self, mm, size):
+        offsets = self.offsets
+        offsets.append(0)
+        pos = mm.find(b"\n")
+        while pos != -1 and pos + 1 < size:
+            offsets.append(pos + 1)
+            pos = mm.find(b"\n", pos + 1)
+
+    def _build_csv(self, mm, size):
+        # a newline ends a record only when it is outside quotes, escaped quotes ("") keep the parity
+        offsets, end_lines = self.offsets, self.end_lines
+        offsets.append(0)
+        start, line_no, in_quotes = 0, 0, False
+        while start < size:
+            pos = mm.find(b"\n", start)
+            end = pos if pos != -1 else size
+            line_no += 1
+            if mm[start:end].count(b'"') % 2:
+                in_quotes = not in_quotes
+            if not in_quotes or pos == -1:
+                end_lines.append(line_no)
+                if pos != -1 and pos + 1 < size:
+                    offsets.append(pos + 1)
+            if pos == -1:
+                break
+            start = pos + 1
+        if len(end_lines) < len(offsets):
+            # unbalanced quote at the end of the file, csv reader ends the record at EOF
+            end_lines.append(line_no)
+
+    def _read(self, stat):
+        try:
+            with open(self.index_path, "rb") as f:
+                magic, csv_mode, mtime_ns, size, count = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != _MAGIC or bool(csv_mode) != self.csv_mode or mtime_ns != stat.st_mtime_ns or size != stat.st_size:
+                    return False
+                self.offsets = array("Q")
+                self.offsets.fromfile(f, count)
+                self.end_lines = array("Q")
+                if self.csv_mode:
+                    self.end_lines.fromfile(f, count)
+        except (OSError, EOFError, struct.error):
+            return False
+        return True
+
+    def _write(self, stat):
+        tmp_path = "{}.tmp{}".format(self.index_path, os.getpid())
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, int(self.csv_mode), stat.st_mtime_ns, stat.st_size, len(self.offsets)))
+                self.offsets.tofile(f)
+                if self.csv_mode:
+                    self.end_lines.tofile(f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # a read-only directory only costs the rebuild next time
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
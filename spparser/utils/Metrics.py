@@ -0,0 +1,124 @@
+import time
+import logging
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+# called with every exported snapshot of Metrics created without an exporter of its own
+_default_exporter = None
+
+
+def set_exporter(exporter):
+    global _default_exporter
+    _default_exporter = exporter
+
+
+def log_exporter(level=logging.INFO):
+    def export(snapshot):
+        logger.log(level, "%s: %s", snapshot["name"], snapshot)
+    return export
+
+
+def make_metrics(metrics, name):
+    # readers and writers accept metrics=None/False (off), True or a Metrics instance
+    if not metrics:
+        return None
+    if metrics is True:
+        return Metrics(name)
+    if metrics.name is None:
+        metrics.name = name
+    return metrics
+
+
+class Histogram(object):
+    # log2 buckets from 100us to ~13s, the last one open ended
+    BOUNDS = [0.0001 * 2 ** i for i in range(18)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th value
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.BOUNDS[i] if i < len(self.BOUNDS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {"count": self.count, "sum": self.total, "max": self.max, "p50": self.quantile(0.5),
+                "p90": self.quantile(0.9), "p99": self.quantile(0.99),
+                "buckets": dict(zip(["{:g}".format(b) for b in self.BOUNDS] + ["inf"], self.counts))}
+
+
+class Metrics(object):
+    # per reader/writer counters and timers:
+    #   blocked_time  time the caller spent inside __anext__/write, the batch_latency histogram holds it per call
+    #   idle_time     time between two calls, spent by the consumer (readers) or the producer (writers)
+    #   io_time       time in the sink itself, for writers that flush or write in the background
+    def __init__(self, name=None, exporter=None, export_interval=None):
+        self.name = name
+        self.exporter = exporter
+        self.export_interval = export_interval
+        self.counters = {"rows": 0, "bytes": 0, "batches": 0}
+        self.timers = {"blocked_time": 0.0, "idle_time": 0.0, "io_time": 0.0}
+        self.histograms = {"batch_latency": Histogram()}
+        self.started = time.time()
+        self._last_end = None
+        self._last_export = time.perf_counter()
+
+    def incr(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name, seconds):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def observe(self, name, value):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        self.histograms[name].observe(value)
+
+    def begin(self):
+        t = time.perf_counter()
+        if self._last_end is not None:
+            self.timers["idle_time"] += t - self._last_end
+        return t
+
+    def end(self, t, rows, nbytes=0):
+        now = time.perf_counter()
+        self.timers["blocked_time"] += now - t
+        self.histograms["batch_latency"].observe(now - t)
+        self.counters["rows"] += rows
+        self.counters["batches"] += 1
+        if nbytes:
+            self.counters["bytes"] += nbytes
+        self._last_end = now
+        if self.export_interval is not None and now - self._last_export >= self.export_interval:
+            self.export()
+
+    def reset_idle(self):
+        # the gap to the next run of a reader is not consumer time
+        self._last_end = None
+
+    def snapshot(self):
+        return {"name": self.name, "started": self.started, "counters": dict(self.counters), "timers": dict(self.timers),
+                "histograms": {k: v.as_dict() for k, v in self.histograms.items()}}
+
+    def export(self):
+        self._last_export = time.perf_counter()
+        exporter = self.exporter or _default_exporter
+        if exporter is not None:
+            exporter(self.snapshot())
@@ -2,28 +2,51 @@ import lxml
 from lxml import etree
 from lxml.etree import HTMLParser
 from ..utils import Exceptions
+from ..utils.LRUCache import LRUCache
+
+# compiled etree.XPath objects shared by the whole process, keyed by expression
+xpath_cache = LRUCache(maxsize=1024)
+
+
+def compile_xpath(xpath_exp):
+    compiled = xpath_cache.get(xpath_exp)
+    if compiled is None:
+        compiled = etree.XPath(xpath_exp)
+        xpath_cache.put(xpath_exp, compiled)
+    return compiled
+
 
 class XpathUtils(object):
-    def __init__(self, xpath_exp, text, parser_type="html"):
+    def __init__(self, xpath_exp, text=None, parser_type="html", tree=None):
         self.xpath_exp = xpath_exp
         self.text = text
+        self.tree = tree
         self.parser_type = parser_type
         self.parser_type_map = {
-                                 "html": HTMLParser(),
+                                 "html": HTMLParser,
                                       }
         if self.parser_type not in self.parser_type_map.keys():
             raise Exceptions.XpathParserTypeError
 
+    def _get_tree(self):
+        if self.tree is None:
+            self.tree = etree.HTML(self.text, self.parser_type_map[self.parser_type]())
+        return self.tree
+
     def extract_first(self):
-        html = etree.HTML(self.text, self.parser_type_map[self.parser_type])
-        res = html.xpath(self.xpath_exp)
+        html = self._get_tree()
+        if html is None:
+            return None
+        res = compile_xpath(self.xpath_exp)(html)
         if not res:
             return None
         return res[0]
 
     def extract_all(self):
-        html = etree.HTML(self.text, self.parser_type_map[self.parser_type])
-        res = html.xpath(self.xpath_exp)
+        html = self._get_tree()
+        if html is None:
+            return None
+        res = compile_xpath(self.xpath_exp)(html)
         if not res:
             return None
         return res
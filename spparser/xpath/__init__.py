@@ -1 +1 @@
-from .XpathUtils import XpathUtils
+from .XpathUtils import XpathUtils, compile_xpath, xpath_cache
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+motor_asyncio = pytest.importorskip("motor.motor_asyncio")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from spparser.AsyncReader import async_mongo_reader
+from spparser.utils.Checkpoint import FileCheckpointStore
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setattr(motor_asyncio, "AsyncIOMotorClient", lambda *args, **kwargs: client)
+    asyncio.run(client["db"]["c"].insert_many([{"_id": i, "k": 1000 - i, "v": i % 3} for i in range(100)]))
+    return client
+
+
+def read_all(reader, stop_after=None):
+    async def collect():
+        docs = []
+        async for each in reader:
+            docs.extend(each)
+            if stop_after is not None and len(docs) >= stop_after:
+                reader.save_checkpoint()
+                await reader._stop_scans()
+                break
+        return docs
+    return asyncio.run(collect())
+
+
+def test_checkpoint_with_excluded_split_key(client, tmp_path):
+    store = FileCheckpointStore(str(tmp_path / "ck.json"))
+
+    def make():
+        return async_mongo_reader("c", host="h", port=1, database="db", batch_size=10, debug=False, partitions=3,
+                                  projection={"_id": 0}, checkpoint=store)
+    first = read_all(make(), stop_after=30)
+    rest = read_all(make())
+    assert len(first) + len(rest) == 100
+    assert all(set(doc) == {"k", "v"} for doc in first + rest)
+
+
+@pytest.mark.parametrize("projection", [{"v": 1}, ["v"], {"k": 0}])
+def test_partitions_keep_the_projection(client, projection):
+    reader = async_mongo_reader("c", host="h", port=1, database="db", batch_size=10, debug=False, split_points=[500, 950],
+                                split_key="k", projection=projection)
+    docs = read_all(reader)
+    assert sorted(doc["_id"] for doc in docs) == list(range(100))
+    assert all("k" not in doc for doc in docs)
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+motor_asyncio = pytest.importorskip("motor.motor_asyncio")
+errors = pytest.importorskip("pymongo.errors")
+
+from spparser.AsyncWriter import async_mongo_writer
+from spparser.utils import Exceptions
+
+
+class FakeCollection(object):
+    name = "c"
+
+    async def bulk_write(self, requests, ordered=True):
+        await asyncio.sleep(0)
+        if any(r._doc["$set"].get("bad") for r in requests):
+            raise errors.BulkWriteError({"writeErrors": [{"index": 0}]})
+
+
+@pytest.fixture(autouse=True)
+def client(monkeypatch):
+    collection = FakeCollection()
+    monkeypatch.setattr(motor_asyncio, "AsyncIOMotorClient", lambda *args, **kwargs: {"db": {"c": collection}})
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_failed_batches_are_not_counted(concurrency):
+    async def main():
+        writer = async_mongo_writer("c", host="h", port=1, database="db", sub_batch_size=5, concurrency=concurrency,
+                                    errors="collect", debug=False)
+        await writer.write([{"_id": i, "bad": i == 7} for i in range(20)])
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(main())
+    assert writer.done_lines_num == 15
+    assert [b["batch"] for b in writer.failed_batches] == [2]
+
+
+def test_concurrency_needs_async_with():
+    with pytest.raises(Exceptions.ParamsError):
+        with async_mongo_writer("c", host="h", port=1, database="db", concurrency=2, debug=False):
+            pass
+    with async_mongo_writer("c", host="h", port=1, database="db", debug=False):
+        pass
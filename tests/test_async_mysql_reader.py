@@ -0,0 +1,72 @@
+import asyncio
+import re
+
+import pytest
+
+aiomysql = pytest.importorskip("aiomysql")
+
+from spparser.AsyncReader import async_mysql_reader
+
+ROWS = [{"id": i, "name": "a{}".format(i)} for i in range(1, 8)]
+
+
+class FakeCursor(object):
+    def __init__(self, executed):
+        self.executed = executed
+        self.rows = []
+
+    async def execute(self, sql, args=None):
+        # like the real driver: the statement is %-formatted whenever args are given
+        if args is not None:
+            sql = sql % tuple(repr(a) for a in args)
+        self.executed.append(sql)
+        key = re.search(r"WHERE id > (\d+)", sql)
+        limit = int(re.search(r"LIMIT (\d+)", sql).group(1))
+        self.rows = [r for r in ROWS if not key or r["id"] > int(key.group(1))][:limit]
+
+    async def fetchall(self):
+        return self.rows
+
+    async def close(self):
+        pass
+
+
+class FakeConnection(object):
+    def __init__(self, executed):
+        self.executed = executed
+
+    async def cursor(self, *args):
+        return FakeCursor(self.executed)
+
+    def close(self):
+        pass
+
+
+def read_all(reader):
+    async def collect():
+        return [row async for batch in reader for row in batch]
+    return asyncio.run(collect())
+
+
+@pytest.fixture
+def executed(monkeypatch):
+    executed = []
+
+    async def connect(**kwargs):
+        return FakeConnection(executed)
+    monkeypatch.setattr(aiomysql, "connect", connect)
+    return executed
+
+
+def test_keyset_query_with_percent(executed):
+    reader = async_mysql_reader("SELECT * FROM t WHERE name LIKE 'a%'", host="h", database="d", batch_size=3,
+                                keyset_column="id", debug=False)
+    assert [r["id"] for r in read_all(reader)] == [r["id"] for r in ROWS]
+    assert all("LIKE 'a%'" in sql for sql in executed)
+
+
+def test_keyset_resume_with_percent(executed):
+    reader = async_mysql_reader("SELECT * FROM t WHERE DATE_FORMAT(d, '%Y') = '2024'", host="h", database="d", batch_size=3,
+                                keyset_column="id", keyset_start=2, debug=False)
+    assert [r["id"] for r in read_all(reader)] == [3, 4, 5, 6, 7]
+    assert all("'%Y'" in sql for sql in executed)
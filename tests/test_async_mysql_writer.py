@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+
+aiomysql = pytest.importorskip("aiomysql")
+
+from spparser.AsyncWriter import async_mysql_writer
+from spparser.utils import Exceptions
+
+
+class FakeCursor(object):
+    def __init__(self, server):
+        self.server = server
+        self.max_stmt_length = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def execute(self, sql, args=None):
+        self.server.statements.append(sql)
+
+    async def fetchone(self):
+        return (self.server.max_allowed_packet,)
+
+    async def executemany(self, sql, params):
+        await asyncio.sleep(0)
+        self.server.statements.append(sql)
+        if any("bad" in row for row in params):
+            raise ValueError("bad row")
+        self.server.batches.append((self.max_stmt_length, list(params)))
+
+
+class FakeConnection(object):
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self):
+        return FakeCursor(self.server)
+
+    async def commit(self):
+        self.server.commits += 1
+
+    async def rollback(self):
+        self.server.rollbacks += 1
+
+
+class FakeAcquire(object):
+    def __init__(self, server):
+        self.server = server
+
+    async def __aenter__(self):
+        return FakeConnection(self.server)
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class FakePool(object):
+    def __init__(self, server):
+        self.server = server
+
+    def acquire(self):
+        return FakeAcquire(self.server)
+
+    def close(self):
+        self.server.closed = True
+
+    async def wait_closed(self):
+        pass
+
+    def terminate(self):
+        self.server.closed = True
+
+
+class FakeServer(object):
+    max_allowed_packet = 4 * 1024 * 1024
+
+    def __init__(self):
+        self.statements = []
+        self.batches = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+
+    async def create_pool(**kwargs):
+        return FakePool(server)
+    monkeypatch.setattr(aiomysql, "create_pool", create_pool)
+    return server
+
+
+def make(**kwargs):
+    return async_mysql_writer(table="t", host="h", database="d", debug=False, **kwargs)
+
+
+def test_batches_use_executemany(server):
+    async def main():
+        writer = make(write_mode="upsert", max_stmt_length=4096)
+        await writer.write([{"a": 1, "b": [1]}, {"b": "x", "a": 2}])
+        await writer.write([{"a": 3}])
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(main())
+    assert server.batches == [(4096, [(1, "[1]"), (2, "x")]), (4096, [(3, None)])]
+    assert server.statements[-1] == "INSERT INTO t (a,b) VALUES (%s,%s) ON DUPLICATE KEY UPDATE a=VALUES(a),b=VALUES(b)"
+    assert server.commits == 2
+    assert writer.total_count == 3
+    assert server.closed
+
+
+def test_failed_batch_raises_and_writer_recovers(server):
+    async def main():
+        writer = make()
+        await writer.write([{"a": 1}])
+        with pytest.raises(Exceptions.AsyncWriterError):
+            await writer.write([{"a": "bad"}])
+        # the failed batch is rolled back, the next one is written again
+        await writer.write([{"a": 2}])
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(main())
+    assert server.rollbacks == 1
+    assert [params for _, params in server.batches] == [[(1,)], [(2,)]]
+    assert writer.total_count == 2
+
+
+def test_pool_errors_raise_on_flush(server):
+    async def main():
+        writer = make(pool_size=3)
+        await writer.write([{"a": 1}, {"a": 2}])
+        await writer.write([{"a": "bad"}])
+        await writer.write([{"a": 3}])
+        with pytest.raises(Exceptions.AsyncWriterError):
+            await writer.close()
+        return writer
+
+    writer = asyncio.run(main())
+    assert writer.total_count == 3
+    assert server.rollbacks == 1
+    assert server.closed
+
+
+def test_pool_needs_async_with(server):
+    with pytest.raises(Exceptions.ParamsError):
+        with make(pool_size=2):
+            pass
+    with make():
+        pass
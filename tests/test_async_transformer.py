@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from spparser.AsyncTransformer import AsyncTransformer
+
+
+class ListWriter(object):
+    def __init__(self):
+        self.rows = []
+        self.closed = False
+
+    async def write(self, each):
+        self.rows.extend(each)
+
+    async def close(self):
+        self.closed = True
+
+
+class CountingReader(object):
+    def __init__(self, batches):
+        self.batches = batches
+        self.read = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.read == self.batches:
+            raise StopAsyncIteration
+        self.read += 1
+        return [self.read - 1]
+
+
+def test_ordered_window_is_bounded():
+    async def main():
+        reader = CountingReader(100)
+        writer = ListWriter()
+        first = asyncio.Event()
+
+        async def transform(each):
+            # the first batch stalls while the others finish at once
+            if each == [0]:
+                await first.wait()
+            return each
+
+        transformer = AsyncTransformer(reader, writer, transform=transform, workers=2, queue_size=4, ordered=True, debug=False)
+        task = asyncio.ensure_future(transformer.run())
+        for _ in range(50):
+            await asyncio.sleep(0)
+        stalled_at = reader.read
+        first.set()
+        await task
+        return stalled_at, writer.rows
+
+    stalled_at, rows = asyncio.run(main())
+    assert stalled_at <= 4 + 1
+    assert rows == list(range(100))
+
+
+def test_writers_closed_on_failure():
+    def boom(each):
+        raise ValueError("boom")
+
+    writer = ListWriter()
+    transformer = AsyncTransformer(CountingReader(3), writer, transform=boom, debug=False)
+    with pytest.raises(ValueError):
+        asyncio.run(transformer.run())
+    assert writer.closed
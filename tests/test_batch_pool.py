@@ -0,0 +1,30 @@
+import asyncio
+import threading
+
+from spparser import Extractor
+from spparser.utils.BatchPool import BatchPool
+
+
+class FakeExecutor(object):
+    def __init__(self):
+        self.threads = []
+
+    def shutdown(self, wait=True):
+        self.threads.append(threading.current_thread())
+
+
+def test_aclose_shuts_down_off_the_event_loop():
+    async def main():
+        executor = FakeExecutor()
+        async with BatchPool(len) as pool:
+            pool.executor = executor
+        return executor, threading.current_thread()
+
+    executor, loop_thread = asyncio.run(main())
+    assert len(executor.threads) == 1
+    assert executor.threads[0] is not loop_thread
+
+
+def test_amap():
+    texts = ["<p>{}</p>".format(i) for i in range(5)]
+    assert asyncio.run(Extractor.amap("xpath", "//p/text()", texts, processes=1)) == [str(i) for i in range(5)]
@@ -0,0 +1,58 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from spparser.csv.ColumnUtils import ColumnBuilder
+
+
+def build(header, *chunks, **kwargs):
+    builder = ColumnBuilder(header, **kwargs)
+    for chunk in chunks:
+        builder.append(chunk)
+    return builder.result()
+
+
+def test_promotion_to_object_keeps_raw_text():
+    res = build(["a", "b", "c"],
+                [["01", "2.50", "true"], ["2", "3.0", "false"]],
+                [["x", "y", "maybe"]])
+    assert res["a"].dtype == object
+    assert res["a"].tolist() == ["01", "2", "x"]
+    assert res["b"].tolist() == ["2.50", "3.0", "y"]
+    assert res["c"].tolist() == ["true", "false", "maybe"]
+
+
+def test_promotion_to_float_reparses():
+    res = build(["a"], [["1"], ["2"]], [["2.5"], [""]])
+    assert res["a"].dtype == np.float64
+    assert res["a"][:3].tolist() == [1.0, 2.0, 2.5]
+    assert np.isnan(res["a"][3])
+
+
+def test_promotion_from_float_to_object_after_int():
+    res = build(["a"], [["007"]], [["1.5"]], [["n/a"]])
+    assert res["a"].tolist() == ["007", "1.5", "n/a"]
+
+
+def test_no_raw_cells_past_the_sample_window():
+    builder = ColumnBuilder(["a", "b"], sample_size=4)
+    builder.append([["1", "x"], ["2", "y"]])
+    assert set(builder.raw) == {"a"}
+    builder.append([["3", "z"], ["4", "w"], ["5", "v"]])
+    assert builder.raw is None
+    builder.append([["6", "u"]])
+    assert builder.raw is None
+    assert builder.result()["a"].tolist() == [1, 2, 3, 4, 5, 6]
+
+
+def test_late_promotion_reads_the_column_again(tmp_path):
+    from spparser import Reader
+
+    path = tmp_path / "late.csv"
+    values = ["{:02d}".format(i) for i in range(30)] + ["n/a"]
+    path.write_text("a,b\n" + "".join("{},{}\n".format(v, i) for i, v in enumerate(values)))
+    res = Reader.read_csv_columns(str(path), sample_size=5, chunk_size=5)
+    assert list(res) == ["a", "b"]
+    assert res["a"].dtype == object
+    assert res["a"].tolist() == values
+    assert res["b"].tolist() == list(range(31))
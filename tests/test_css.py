@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("lxml")
+
+from spparser import Extractor
+from spparser.Document import Document
+
+PAGE = "<html><body><ul><li class='a'>1</li><li>2 <b>x</b></li></ul></body></html>"
+
+
+# results PyQuery(text) gave for these inputs, before css ran on lxml directly
+@pytest.mark.parametrize("css_exp, text, kwargs, expected", [
+    ("p", "<p>just text</p>", {"return_all": True}, []),
+    ("p", "<p>just text</p>", {}, "just text"),
+    ("div", "<li>a</li><li>b</li>", {}, "<li>a</li><li>b</li>"),
+    ("li", "<li>a</li><li>b</li>", {"return_all": True}, ["a", "b"]),
+    ("*", "<p>just text</p>", {}, "just text"),
+    ("*", "<p>just text</p>", {"return_all": True}, []),
+    ("li", PAGE, {"return_all": True}, ["1", "2 x"]),
+    ("li", PAGE, {"return_all": True, "remove_tags_exp": "b"}, ["1", "2"]),
+    ("li", PAGE, {"result_type": "attr", "attr_name": "class"}, "a"),
+    ("li", "   ", {"return_all": True}, []),
+])
+def test_css_matches_pyquery_roots(css_exp, text, kwargs, expected):
+    assert Extractor.css(css_exp, text, **kwargs) == expected
+    assert Document(text).css(css_exp, **kwargs) == expected
+
+
+def test_document_keeps_xpath_on_the_html_tree():
+    doc = Document("<p>just text</p>")
+    assert doc.xpath("//body/p/text()") == "just text"
+    assert doc.css("p", return_all=True) == []
+
+
+@pytest.mark.parametrize("text", ["<p>just text</p>", "<li>a</li><li>b</li>", PAGE])
+def test_pyquery_engine_reads_the_text(text):
+    pyquery = pytest.importorskip("pyquery")
+    doc = Document(text)
+    doc.tree
+    for css_exp in ["p", "li", "div", "*"]:
+        expected = [i.text() for i in pyquery.PyQuery(text).find(css_exp).items()]
+        assert doc.css(css_exp, return_all=True, engine="pyquery") == expected
+    # removing tags never touches the document shared with the other extractions
+    doc.css("li", remove_tags_exp="b", return_all=True, engine="pyquery")
+    assert doc.css("b", return_all=True) == (["x"] if text == PAGE else [])
@@ -0,0 +1,28 @@
+import logging
+
+from spparser.Deduplicator import Deduplicator
+
+
+def test_mixed_type_keys():
+    dedup = Deduplicator()
+    assert dedup.filter([{1: "a", "b": 2}, {"b": 2, 1: "a"}, {1: "a", "b": 3}]) == [{1: "a", "b": 2}, {1: "a", "b": 3}]
+
+
+def test_bloom_cap_warning(caplog):
+    with caplog.at_level(logging.WARNING, logger="spparser.Deduplicator"):
+        Deduplicator(mode="bloom", capacity=100000, max_memory=1024)
+    assert "bloom filter capped at 1024 bytes" in caplog.text
+
+
+def test_exact_table_stays_compact(tmp_path):
+    dedup = Deduplicator(key_fields="u")
+    rows = [{"u": i} for i in range(5000)]
+    assert dedup.filter(rows + rows[:100]) == rows
+    table = dedup._hashes.table
+    assert table.itemsize * len(table) <= 24 * len(rows)
+
+    path = str(tmp_path / "seen.state")
+    dedup.save(path)
+    again = Deduplicator(key_fields="u", state_path=path)
+    assert len(again) == 5000
+    assert again.filter([{"u": 1}, {"u": 5000}]) == [{"u": 5000}]
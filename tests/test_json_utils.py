@@ -0,0 +1,22 @@
+import pytest
+
+from spparser.csv.Record import Schema
+from spparser.json import JsonUtils
+
+orjson = pytest.importorskip("orjson")
+
+SCHEMA = Schema(["a", "b"])
+
+
+@pytest.mark.parametrize("obj", [
+    {"rows": [SCHEMA.make(["1", "x"])], "n": 1},
+    SCHEMA.make(["1", None]),
+    [SCHEMA.make(["é", "2"]), (1, 2)],
+    {"nan": float("nan"), "inf": [float("inf"), -float("inf")], "f": 1.5},
+    {"s": "naïve \"quoted\"", "t": True, "none": None},
+])
+def test_both_backends_write_the_same(obj, monkeypatch):
+    fast = JsonUtils.dumps(obj)
+    monkeypatch.setattr(JsonUtils, "orjson", None)
+    assert JsonUtils.dumps(obj) == fast
+    assert JsonUtils.loads(fast) == orjson.loads(fast)
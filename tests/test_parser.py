@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip("lxml")
+
+from spparser.Parser import Parser
+
+HTML = '<html><body><a href=" /a ">A</a><a>B</a></body></html>'
+
+
+def test_processors_skip_missing_attr():
+    parser = Parser({
+        "href": {"xpath": "//a[2]", "result_type": "attr", "attr_name": "href", "processors": [str.strip], "default": ""},
+        "hrefs": {"xpath": "//a", "result_type": "attr", "attr_name": "href", "processors": [str.strip], "return_all": True},
+        "first": {"xpath": "//a[1]", "result_type": "attr", "attr_name": "href", "processors": [str.strip]},
+    })
+    assert parser.parse(HTML) == {"href": "", "hrefs": ["/a", None], "first": "/a"}
+
+
+def test_processors_skip_no_match():
+    parser = Parser({
+        "year": {"regex": r"\d{4}", "processors": [int], "default": 0},
+        "title": {"xpath": "//h1/text()", "processors": [str.strip], "default": "untitled"},
+    })
+    assert parser.parse(HTML) == {"year": 0, "title": "untitled"}
@@ -0,0 +1,20 @@
+import asyncio
+
+from spparser.ShardedReader import ShardedReader
+from spparser.utils.BatchPool import BatchPool
+
+
+def test_async_iteration_closes_the_pool_without_blocking(tmp_path, monkeypatch):
+    path = tmp_path / "rows.csv"
+    path.write_text("a,b\n" + "".join("{},{}\n".format(i, i * 2) for i in range(50)))
+
+    def blocking_close(self):
+        raise AssertionError("the pool was shut down on the event loop")
+    monkeypatch.setattr(BatchPool, "close", blocking_close)
+
+    async def main():
+        reader = ShardedReader(str(path), batch_size=20, processes=1, shard_size=64)
+        return [row async for batch in reader for row in batch]
+
+    rows = asyncio.run(main())
+    assert rows == [{"a": str(i), "b": str(i * 2)} for i in range(50)]